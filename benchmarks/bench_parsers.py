@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Rhizome listing parsers.
+
+Runs every parser over the pages in benchmarks/fixtures/ (a hand-built
+community page modelled on the listings in data/rhizome.json and a
+standard Cloudflare challenge page, with expected listing counts in
+fixtures/expected.json) and over synthetic pages, 10 KB to 1 MB by
+default. Reports throughput, peak Python memory and listings found versus
+expected.
+
+The original link regex is included as a reference point, next to the
+rule-based stdlib scanner, RuleParser tokenizing the whole page and
+BeautifulSoup.
+
+Usage:
+  python3 benchmarks/bench_parsers.py
+  python3 benchmarks/bench_parsers.py --sizes 10k,1m --repeat 5 --json bench_output.json
+  python3 benchmarks/bench_parsers.py --sizes 10m,30m --parser 'baseline regex (reference)'
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+import fetch_rhizome  # noqa: E402
+
+
+def parse_with_baseline_regex(html_content):
+    """The original fetch_rhizome parser: /community/ links found by one regex."""
+    listings = []
+    links = re.findall(r'<a[^>]*href="(/community/[^"]*)"[^>]*>(.*?)</a>', html_content, re.DOTALL)
+    for url, title in links[:15]:
+        title_clean = re.sub(r'<[^>]+>', '', title).strip()
+        if title_clean and len(title_clean) > 3:
+            listings.append({"title": title_clean, "url": f"https://rhizome.org{url}"})
+    return listings
+
+
+def parse_with_full_rule_parser(html_content):
+    from extraction_rules import RuleParser
+
+    parser = RuleParser(fetch_rhizome.RHIZOME_RULES)
+    parser.feed(html_content)
+    parser.close()
+    return parser.get_listings()
+
+
+def parse_with_beautifulsoup(html_content):
+    from scrape_rhizome import parse_community_listings
+
+    return parse_community_listings(html_content)
+
+
+PARSERS = {
+    'baseline regex (reference)': parse_with_baseline_regex,
+    'fetch_rhizome.parse_community_listings': fetch_rhizome.parse_community_listings,
+    'extraction_rules.RuleParser (whole page)': parse_with_full_rule_parser,
+    'scrape_rhizome.parse_community_listings': parse_with_beautifulsoup,
+}
+
+SYNTHETIC_LISTINGS = 15
+
+FILLER_BLOCK = (
+    '<div class="sidebar"><ul><li><a href="/editorial/">Editorial</a></li>'
+    '<li><a href="/art/">Art</a></li></ul><p>Lorem ipsum dolor sit amet, '
+    '<b>consectetur <i>adipiscing</b> elit</i>, sed do eiusmod tempor.<br>'
+    '<img src="/static/img/x.png" alt="x"></p><span>unclosed</div>\n'
+    '<script>window.dataLayer = window.dataLayer || []; gtag("js", new Date());</script>\n'
+)
+
+
+def parse_size(text):
+    """Parse sizes like 10k, 1m, 2500 into bytes."""
+    units = {'k': 1024, 'm': 1024 * 1024}
+    text = text.strip().lower()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def synthetic_page(size):
+    """Build a page of roughly size bytes with the listings at the very end.
+
+    Listings come last so every parser has to get through all the filler,
+    which is the worst case for early-terminating parsers.
+    """
+    listings = ''.join(
+        f'<article class="listing"><h3><a href="/community/{90000 + i}/">Synthetic listing {i}</a></h3>'
+        f'<p class="summary">Description for listing {i}</p><time datetime="2025-01-{1 + i % 28:02d}">x</time></article>\n'
+        for i in range(SYNTHETIC_LISTINGS)
+    )
+    head = '<!DOCTYPE html><html><head><title>Community | Rhizome</title></head><body><main>\n'
+    tail = '</main></body></html>\n'
+    filler_size = max(0, size - len(head) - len(listings) - len(tail))
+    # Whole blocks only, so no tag or script is cut in half
+    return head + FILLER_BLOCK * (filler_size // len(FILLER_BLOCK)) + listings + tail
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, 'expected.json')) as f:
+        expected = json.load(f)
+    for name in sorted(expected):
+        with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+            yield name, f.read(), expected[name]
+
+
+def measure(parse, html_content, repeat):
+    """Return (best seconds, peak bytes, listings found) for one parser and page."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        listings = parse(html_content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Separate pass: tracemalloc slows allocation-heavy parsers down a lot
+    gc.collect()
+    tracemalloc.start()
+    parse(html_content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak, len(listings)
+
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Rhizome listing parsers')
+    parser.add_argument('--sizes', default='10k,100k,1m',
+                        help='synthetic page sizes (default: 10k,100k,1m; BeautifulSoup takes '
+                             'minutes from 10m up)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timing runs per page; the best is reported (default: 3)')
+    parser.add_argument('--parser', action='append', choices=sorted(PARSERS),
+                        help='only run this parser (repeatable)')
+    parser.add_argument('--json', metavar='PATH', help='also write results as JSON to PATH')
+    args = parser.parse_args(argv)
+
+    pages = list(load_fixtures())
+    for size in args.sizes.split(','):
+        if size:
+            pages.append((f"synthetic-{size.strip()}", synthetic_page(parse_size(size)), SYNTHETIC_LISTINGS))
+
+    parsers = {name: PARSERS[name] for name in (args.parser or PARSERS)}
+    results = []
+
+    print(f"{'page':<28} {'parser':<42} {'size':>9} {'MB/s':>8} {'peak mem':>10} {'found':>7}")
+    for page_name, html_content, expected in pages:
+        size = len(html_content.encode('utf-8'))
+        for parser_name, parse in parsers.items():
+            # Large pages get a single timing run to keep the suite bearable
+            repeat = args.repeat if size < 5 * 1024 * 1024 else 1
+            seconds, peak, found = measure(parse, html_content, repeat)
+            throughput = size / seconds / (1024 * 1024) if seconds else float('inf')
+            status = '' if found == expected else ' !'
+            print(f"{page_name:<28} {parser_name:<42} {format_bytes(size):>9} {throughput:>8.2f} "
+                  f"{format_bytes(peak):>10} {found:>3}/{expected:<3}{status}")
+            results.append({
+                "page": page_name,
+                "parser": parser_name,
+                "bytes": size,
+                "seconds": seconds,
+                "mb_per_second": throughput,
+                "peak_memory_bytes": peak,
+                "listings_found": found,
+                "listings_expected": expected,
+            })
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    mismatches = [r for r in results if r['listings_found'] != r['listings_expected']]
+    if mismatches:
+        print(f"\n{len(mismatches)} run(s) found a different number of listings than expected", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
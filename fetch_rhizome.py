@@ -1,15 +1,57 @@
 #!/usr/bin/env python3
 """
 Fetch Rhizome community listings.
-Supports both Playwright (for Cloudflare bypass) and fallback requests.
+Supports both Playwright (for Cloudflare bypass) and a plain HTTP fallback.
 """
 
+import argparse
 import json
 import os
+import shutil
 import sys
-import re
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+
+from cassette import activate as activate_cassette
+from cassette import active as active_cassette
+from cloudflare import CircuitBreaker, is_challenge_page, is_challenge_response, read_head
+from extraction_rules import EXTRACT_JS, extract_listings, load_rules
+from fetch_strategy import StrategyStats, run_strategies
+from http_cache import DEFAULT_CACHE_DIR, NOT_MODIFIED, ValidatorCache, write_atomic
+from http_client import default_client
+from merge_listings import load_previous, merge_listings, unchanged_summary, write_changes
+from poll_schedule import AdaptivePoll
+from run_metrics import annotate, span
+from run_metrics import start as start_metrics
+from snapshot_store import SnapshotStore
+
+RHIZOME_RULES = load_rules('rhizome_rules')
+SNAPSHOTS = SnapshotStore()
+
+COMMUNITY_URL = os.environ.get('RHIZOME_URL', 'https://rhizome.org/community/')
+OUTPUT_PATH = 'data/rhizome.json'
+METRICS_PATH = 'data/rhizome.metrics.jsonl'
+HISTORY_DIR = os.path.join(os.path.dirname(OUTPUT_PATH), 'history')
+BROWSER_PROFILE_DIR = os.environ.get(
+    'RHIZOME_BROWSER_PROFILE', os.path.join(DEFAULT_CACHE_DIR, 'browser-profile')
+)
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Lean mode: resources we never parse are aborted before they hit the network
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font', 'stylesheet'}
+TRACKER_HOSTS = ('google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+                 'facebook.net', 'hotjar.com', 'stats.wp.com')
+# A listing link (not the /community/ index link itself) means the real page is in
+READY_SELECTOR = 'a[href^="/community/"]:not([href="/community/"])'
+DEFAULT_DEADLINE = 20
+
+# Assumed seconds-to-success for fetch methods with no recorded history yet
+DEFAULT_STRATEGY_COSTS = {'requests': 2.0, 'playwright': 30.0}
+
 def create_fallback_data():
     """Create fallback data structure when scraping is blocked."""
     return {
@@ -29,63 +71,225 @@ def create_fallback_data():
 
 def parse_community_listings(html_content):
     """Parse HTML content to extract community listings."""
-    listings = []
-
-    # Try to extract listing items from common patterns
-    # Rhizome uses various structures, so we'll try multiple patterns
+    return extract_listings(html_content, RHIZOME_RULES)
 
-    # Pattern 1: Look for article or list items with links
-    article_pattern = r'<article[^>]*>(.*?)</article>'
-    item_pattern = r'<li[^>]*class="[^"]*community[^"]*"[^>]*>(.*?)</li>'
+def parse_snapshot(html_content, source):
+    """Keep the page in the snapshot store and parse it unless it was parsed before.
 
-    # Pattern 2: Look for headings with links
-    heading_link_pattern = r'<h[2-4][^>]*>.*?<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>.*?</h[2-4]>'
+    Returns (content hash, listings).
+    """
+    with span('parse', source=source, bytes=len(html_content)) as record:
+        digest, listings = SNAPSHOTS.parse(html_content, RHIZOME_RULES, parse_community_listings,
+                                           url=COMMUNITY_URL, source=source)
+        record['items'] = len(listings)
+    return digest, listings
 
-    # Pattern 3: Look for description paragraphs
-    desc_pattern = r'<p[^>]*class="[^"]*description[^"]*"[^>]*>(.*?)</p>'
+class ResidentBrowser:
+    """Playwright and its browser kept running between polls in --watch mode.
 
-    # Simple extraction - find all links in the community section
-    links = re.findall(r'<a[^>]*href="(/community/[^"]*)"[^>]*>(.*?)</a>', html_content, re.DOTALL)
+    Playwright's sync API only works on the thread that started it, so
+    other threads (hedged --adaptive strategies) launch their own browser.
+    """
 
-    for url, title in links[:15]:  # Limit to 15 items
-        # Clean up title
-        title_clean = re.sub(r'<[^>]+>', '', title).strip()
-        if title_clean and len(title_clean) > 3:
-            listing = {
-                "title": title_clean,
-                "description": "",
-                "url": f"https://rhizome.org{url}" if url.startswith('/') else url,
-                "type": "community-listing",
-                "date": datetime.now(timezone.utc).isoformat()
-            }
-            listings.append(listing)
+    def __init__(self):
+        self.thread = None
+        self.playwright = None
+        self.browser = None
+        self.persistent = {}
 
-    return listings
-
-def fetch_with_playwright():
-    """Fetch using Playwright to bypass Cloudflare."""
-    try:
+    def start(self):
         from playwright.sync_api import sync_playwright
 
-        print("Using Playwright to bypass Cloudflare...", file=sys.stderr)
-
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
+        self.playwright = sync_playwright().start()
+        self.thread = threading.current_thread()
+
+    def usable(self):
+        return self.playwright is not None and threading.current_thread() is self.thread
+
+    def get_browser(self):
+        if self.browser is None or not self.browser.is_connected():
+            self.browser = self.playwright.chromium.launch(headless=True)
+        return self.browser
+
+    def get_persistent_context(self, profile_dir):
+        if profile_dir not in self.persistent:
+            self.persistent[profile_dir] = self.playwright.chromium.launch_persistent_context(
+                profile_dir, headless=True, user_agent=USER_AGENT)
+        return self.persistent[profile_dir]
+
+    def discard_persistent_context(self, profile_dir):
+        context = self.persistent.pop(profile_dir, None)
+        if context:
+            context.close()
+
+    def stop(self):
+        for profile_dir in list(self.persistent):
+            self.discard_persistent_context(profile_dir)
+        if self.browser:
+            self.browser.close()
+        if self.playwright:
+            self.playwright.stop()
+        self.__init__()
+
+RESIDENT_BROWSER = ResidentBrowser()
+
+@contextmanager
+def playwright_session():
+    """The resident Playwright instance if this thread owns one, else a fresh one."""
+    if RESIDENT_BROWSER.usable():
+        yield RESIDENT_BROWSER.playwright
+        return
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        yield p
+
+def block_unused_resources(route):
+    """Playwright route handler that aborts images, fonts, styles and trackers."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in TRACKER_HOSTS):
+        route.abort()
+    else:
+        # Falls through to the cassette's handler when one is attached
+        route.fallback()
+
+def load_community_page(p, profile_dir=None, warm=False, lean=False, deadline=DEFAULT_DEADLINE, extract=False):
+    """Launch Chromium, load the community page and return (challenge, payload).
+
+    The payload is the page HTML, or with extract the raw listing records
+    selected inside the page by EXTRACT_JS from RHIZOME_RULES, so the DOM
+    is never serialized and shipped to Python. challenge is True when Cloudflare
+    served its challenge instead of the page.
+
+    With profile_dir the browser runs on a persistent profile, so cookies
+    (including Cloudflare clearance) and the HTTP cache survive across runs.
+    A warm load trusts that saved state and returns as soon as the DOM is
+    ready instead of waiting for network idle plus a fixed delay.
+
+    A lean load aborts resource types we never parse and returns as soon
+    as READY_SELECTOR appears (the Cloudflare challenge, if any, redirects
+    to the real page first), giving up after deadline seconds. Note that
+    Playwright bypasses the browser HTTP cache while routing is enabled.
+
+    In --watch mode the resident browser (or persistent context) is reused
+    and only the page, or a fresh context, is opened and closed per load.
+    """
+    started = time.perf_counter()
+    resident = RESIDENT_BROWSER.usable()
+    with span('browser_launch', warm=warm, resident=resident):
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+            if resident:
+                context = RESIDENT_BROWSER.get_persistent_context(profile_dir)
+                page = context.new_page()
+                closer = page
+            else:
+                context = p.chromium.launch_persistent_context(profile_dir, headless=True, user_agent=USER_AGENT)
+                page = context.pages[0] if context.pages else context.new_page()
+                closer = context
+        else:
+            browser = RESIDENT_BROWSER.get_browser() if resident else p.chromium.launch(headless=True)
+            context = browser.new_context(user_agent=USER_AGENT)
+            page = context.new_page()
+            closer = context if resident else browser
+    launched = time.perf_counter()
 
+    try:
+        # Page-level, so a reused persistent context doesn't pile up handlers
+        if active_cassette():
+            active_cassette().attach(page)
+
+        if lean:
+            from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+            page.route('**/*', block_unused_resources)
+            with span('navigation', wait_until='commit'):
+                page.goto(COMMUNITY_URL, wait_until='commit', timeout=deadline * 1000)
+            with span('challenge_wait') as record:
+                try:
+                    # wait_for_selector keeps waiting across the challenge redirect
+                    page.wait_for_selector(READY_SELECTOR, state='attached', timeout=deadline * 1000)
+                except PlaywrightTimeoutError:
+                    record['timed_out'] = True
+                    print(f"No listing appeared within {deadline}s, using page as-is", file=sys.stderr)
+        elif warm:
+            with span('navigation', wait_until='domcontentloaded'):
+                page.goto(COMMUNITY_URL, wait_until='domcontentloaded', timeout=30000)
+        else:
             # Navigate and wait for page to load
-            page.goto('https://rhizome.org/community/', wait_until='networkidle', timeout=60000)
+            with span('navigation', wait_until='networkidle'):
+                page.goto(COMMUNITY_URL, wait_until='networkidle', timeout=60000)
 
             # Wait a bit for any dynamic content
-            page.wait_for_timeout(3000)
+            with span('challenge_wait'):
+                page.wait_for_timeout(3000)
+
+        with span('download', source='playwright') as record:
+            if extract:
+                payload = page.evaluate(EXTRACT_JS, RHIZOME_RULES.to_browser())
+                challenge = payload is None
+                record['items'] = len(payload or [])
+            else:
+                payload = page.content()
+                challenge = is_challenge_page(payload)
+                record['bytes'] = len(payload)
+            record['challenge'] = challenge
+    finally:
+        closer.close()
+
+    finished = time.perf_counter()
+    print(f"{'Warm' if warm else 'Cold'}{' lean' if lean else ''} browser session: launch {launched - started:.2f}s, "
+          f"page {finished - launched:.2f}s, total {finished - started:.2f}s", file=sys.stderr)
+    return challenge, payload
+
+def fetch_with_playwright(profile_dir=None, lean=False, deadline=DEFAULT_DEADLINE, extract=False):
+    """Fetch using Playwright to bypass Cloudflare.
+
+    With profile_dir an existing browser profile is tried warm first; only
+    if its saved state is rejected (challenge served again) is the profile
+    wiped and the page loaded with a full cold launch. lean, deadline and
+    extract are passed through to load_community_page(). Returns None when
+    the cold launch is challenged as well.
+    """
+    try:
+        breaker = CircuitBreaker('fetch_rhizome.playwright')
+        if not breaker.allow():
+            return None
 
-            html_content = page.content()
-            browser.close()
+        print("Using Playwright to bypass Cloudflare...", file=sys.stderr)
+
+        with playwright_session() as p:
+            payload = None
+
+            if profile_dir and os.path.isdir(profile_dir) and os.listdir(profile_dir):
+                try:
+                    challenge, payload = load_community_page(p, profile_dir, warm=True, lean=lean,
+                                                             deadline=deadline, extract=extract)
+                    if challenge:
+                        print("Saved browser state rejected, falling back to cold launch...", file=sys.stderr)
+                        payload = None
+                except Exception as e:
+                    print(f"Warm browser session failed: {e}", file=sys.stderr)
+                if payload is None:
+                    RESIDENT_BROWSER.discard_persistent_context(profile_dir)
+                    shutil.rmtree(profile_dir, ignore_errors=True)
+
+            if payload is None:
+                challenge, payload = load_community_page(p, profile_dir, lean=lean,
+                                                         deadline=deadline, extract=extract)
+                if challenge:
+                    # Let the caller try plain HTTP, then report cloudflare-protected
+                    print("Cloudflare challenge served to the browser", file=sys.stderr)
+                    breaker.record_challenge()
+                    return None
+            breaker.record_success()
 
             # Parse the content
-            listings = parse_community_listings(html_content)
+            snapshot = None
+            if extract:
+                listings = RHIZOME_RULES.finish_all(payload or [])
+            else:
+                snapshot, listings = parse_snapshot(payload, 'playwright')
 
             if not listings:
                 # If parsing failed, at least we got the page
@@ -99,7 +303,8 @@ def fetch_with_playwright():
                     }],
                     "last_updated": datetime.now(timezone.utc).isoformat(),
                     "status": "partial-success",
-                    "note": "Page accessed via Playwright, HTML parsing may need updates"
+                    "note": "Page accessed via Playwright, HTML parsing may need updates",
+                    "snapshot": snapshot
                 }
 
             return {
@@ -115,60 +320,302 @@ def fetch_with_playwright():
         print(f"Playwright error: {e}", file=sys.stderr)
         return None
 
-def fetch_with_requests():
-    """Fallback: try with requests (likely to be blocked by Cloudflare)."""
-    try:
-        import requests
+def fetch_with_requests(url=COMMUNITY_URL, cache=None):
+    """Fallback: plain HTTP fetch via the shared client (likely to be blocked by Cloudflare).
 
+    With a ValidatorCache the request is conditional, and NOT_MODIFIED is
+    returned when the server answers 304 and a cached parse is available.
+    """
+    try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         }
+        if cache:
+            headers.update(cache.conditional_headers(url))
 
-        response = requests.get('https://rhizome.org/community/', headers=headers, timeout=30)
-
-        if 'challenge-platform' in response.text or response.status_code == 403:
-            print("Cloudflare protection detected with requests.", file=sys.stderr)
+        breaker = CircuitBreaker('fetch_rhizome.requests')
+        if not breaker.allow():
             return None
 
-        listings = parse_community_listings(response.text)
+        # Streamed, so a challenge can be spotted from the headers or first few KB
+        with span('download', source='http') as record, default_client().get(url, headers=headers) as response:
+            record['status'] = response.status
+            if response.status == 304 and cache:
+                if cache.cached_result(url) is not None:
+                    print("Page not modified since last fetch (304).", file=sys.stderr)
+                    return NOT_MODIFIED
+                html_content = cache.cached_body(url)
+                if html_content is None:
+                    return None
+            else:
+                head = b''
+                challenged = response.status == 403 or is_challenge_response(response.status, response.headers)
+                if not challenged:
+                    head = read_head(response.read)
+                    challenged = is_challenge_page(head.decode('utf-8', errors='replace'))
+                record['challenge'] = challenged
+                if challenged:
+                    print("Cloudflare protection detected over plain HTTP, aborting transfer.", file=sys.stderr)
+                    breaker.record_challenge()
+                    return None
+                breaker.record_success()
+                if response.status != 200:
+                    print(f"HTTP error {response.status} {response.reason}", file=sys.stderr)
+                    return None
+
+                html_content = (head + response.read()).decode(response.charset or 'utf-8', errors='replace')
+                record['bytes'] = len(html_content)
+                if cache:
+                    cache.store(url, response.headers, html_content)
+
+        _, listings = parse_snapshot(html_content, 'requests')
 
         if listings:
-            return {
+            data = {
                 "community_listings": listings,
                 "last_updated": datetime.now(timezone.utc).isoformat(),
                 "status": "success"
             }
+            if cache:
+                cache.store_result(url, data)
+            return data
 
         return None
 
     except Exception as e:
-        print(f"Requests error: {e}", file=sys.stderr)
+        print(f"HTTP fetch error: {e}", file=sys.stderr)
         return None
 
-def main():
-    # Try Playwright first, then requests, then fallback
-    data = fetch_with_playwright()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch Rhizome community listings into data/rhizome.json')
+    parser.add_argument('--warm-session', action='store_true',
+                        help=f'reuse a persistent browser profile across runs ({BROWSER_PROFILE_DIR})')
+    parser.add_argument('--lean', action='store_true',
+                        help='block images/fonts/styles/trackers and stop waiting once a listing appears')
+    parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE,
+                        help=f'seconds to wait for a listing in --lean mode (default: {DEFAULT_DEADLINE})')
+    parser.add_argument('--extract-in-page', action='store_true',
+                        help='select listings inside the browser instead of parsing page.content()')
+    parser.add_argument('--enrich', action='store_true',
+                        help='fill in description, URL, type and date from each listing\'s detail page')
+    parser.add_argument('--enrich-concurrency', type=int, default=8,
+                        help='detail pages fetched at once with --enrich (default: 8)')
+    parser.add_argument('--merge', action='store_true',
+                        help='merge into the existing file by listing identity and only write on changes')
+    parser.add_argument('--changes', metavar='PATH',
+                        help='with --merge, write a JSON change summary to PATH')
+    parser.add_argument('--history', action='store_true',
+                        help='append every successful fetch to the history log, '
+                             'including runs that leave the file untouched')
+    parser.add_argument('--history-dir', metavar='DIR', default=HISTORY_DIR,
+                        help=f'directory of the --history log (default: {HISTORY_DIR})')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='try the historically cheapest fetch method first, hedging with the next if it is slow')
+    parser.add_argument('--race', action='store_true',
+                        help='start every fetch method at once and keep the first success')
+    parser.add_argument('--record', metavar='CASSETTE',
+                        help='record every HTTP and browser response of this run to CASSETTE')
+    parser.add_argument('--replay', metavar='CASSETTE',
+                        help='answer every request from CASSETTE instead of the network')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='with --replay, seconds to wait before each response')
+    parser.add_argument('--bandwidth', type=float,
+                        help='with --replay, bytes per second to deliver response bodies at')
+    parser.add_argument('--metrics', metavar='PATH', default=METRICS_PATH,
+                        help=f'append per-phase timings for this run to PATH (default: {METRICS_PATH})')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='write a cProfile dump of the run to PATH (view with python3 -m pstats PATH)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running, polling at an interval adapted to how often listings change '
+                             '(implies --merge; prints one JSON line per detected change)')
+    parser.add_argument('--min-interval', type=float, default=600,
+                        help='with --watch, shortest seconds between polls (default: 600)')
+    parser.add_argument('--max-interval', type=float, default=6 * 3600,
+                        help='with --watch, longest seconds between polls (default: 21600)')
+    parser.add_argument('--max-polls', type=int,
+                        help='with --watch, stop after this many polls')
+    args = parser.parse_args(argv)
+
+    if args.record:
+        activate_cassette(args.record, 'record')
+    elif args.replay:
+        activate_cassette(args.replay, 'replay', args.latency, args.bandwidth)
+
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.watch:
+            watch(args)
+        else:
+            run_once(args)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to {args.profile}", file=sys.stderr)
+    return 0
 
-    if not data:
-        print("Trying with requests library...", file=sys.stderr)
-        data = fetch_with_requests()
+def run_once(args):
+    """run() with its metrics recorded, whichever way it exits."""
+    metrics = start_metrics('fetch_rhizome')
+    try:
+        return run(args)
+    finally:
+        metrics.append(args.metrics)
+
+def watch(args):
+    """Poll run() until interrupted, keeping the browser and HTTP pool warm.
+
+    The wait between polls adapts to the observed change rate (see
+    poll_schedule.py). Each poll that changes the listings prints its change
+    summary to stdout as one JSON line as soon as it is detected.
+    """
+    args.merge = True
+    schedule = AdaptivePoll(min_interval=args.min_interval, max_interval=args.max_interval)
+    try:
+        RESIDENT_BROWSER.start()
+    except ImportError:
+        print("Playwright not installed; watching with plain HTTP only", file=sys.stderr)
+
+    polls = 0
+    try:
+        while True:
+            try:
+                changes = run_once(args)
+            except Exception as e:
+                print(f"Poll failed: {e}", file=sys.stderr)
+                changes = None
+            polls += 1
+
+            changed = bool(changes and changes['changed'])
+            if changed:
+                print(json.dumps({"detected_at": datetime.now(timezone.utc).isoformat(), **changes}), flush=True)
+            delay = schedule.record(changed)
+            if args.max_polls and polls >= args.max_polls:
+                break
+            print(f"Next poll in {delay / 60:.1f} min", file=sys.stderr)
+            time.sleep(delay)
+    except KeyboardInterrupt:
+        print("Stopped watching", file=sys.stderr)
+    finally:
+        RESIDENT_BROWSER.stop()
+
+def run(args):
+    """Fetch, merge and write data/rhizome.json as configured by main()'s arguments.
+
+    Returns the change summary with --merge, else None.
+    """
+    run_started = datetime.now(timezone.utc)
+    cache = ValidatorCache('fetch_rhizome')
+    data = None
+
+    def record_sightings(listings):
+        if args.history and listings:
+            from listing_history import ListingHistory
+
+            with span('history', items=len(listings)):
+                ListingHistory(args.history_dir).append(listings, run_started.isoformat())
+
+    def playwright():
+        return fetch_with_playwright(BROWSER_PROFILE_DIR if args.warm_session else None,
+                                     lean=args.lean, deadline=args.deadline,
+                                     extract=args.extract_in_page)
+
+    if args.adaptive or args.race:
+        strategies = {'requests': lambda: fetch_with_requests(cache=cache), 'playwright': playwright}
+        stats = StrategyStats(default_costs=DEFAULT_STRATEGY_COSTS)
+        _, data = run_strategies(strategies, stats, race=args.race)
+    else:
+        # A previous plain HTTP fetch left validators behind: revalidate them
+        # first, since a 304 lets us skip the browser, the parse and the rewrite
+        revalidated = cache.has_validators(COMMUNITY_URL)
+        if revalidated:
+            data = fetch_with_requests(cache=cache)
+
+        # Try Playwright first, then plain HTTP, then fallback
+        if not data:
+            data = playwright()
+
+        if not data and not revalidated:
+            print("Trying plain HTTP...", file=sys.stderr)
+            data = fetch_with_requests(cache=cache)
+
+    if data is NOT_MODIFIED and os.path.exists(OUTPUT_PATH):
+        annotate(status='not-modified', written=False)
+        print(f"✓ {OUTPUT_PATH} is up to date - nothing to rewrite", file=sys.stderr)
+        previous = load_previous(OUTPUT_PATH) or {}
+        # Same page as last time, so its listings were seen again
+        if previous.get('status') == 'success':
+            record_sightings(previous.get('community_listings', []))
+        if not args.merge:
+            return None
+        changes = unchanged_summary(previous.get('community_listings', []))
+        write_changes(changes, args.changes)
+        return changes
+    if data is NOT_MODIFIED:
+        data = cache.cached_result(COMMUNITY_URL)
 
     if not data:
         print("All methods failed, using fallback data.", file=sys.stderr)
         data = create_fallback_data()
+    annotate(status=data.get('status'), written=False)
+
+    if args.enrich and data.get('status') == 'success':
+        from enrich_listings import enrich_listings
+
+        with span('enrichment', items=len(data['community_listings'])):
+            data['community_listings'] = enrich_listings(data['community_listings'],
+                                                         concurrency=args.enrich_concurrency)
+
+    if args.merge:
+        previous = load_previous(OUTPUT_PATH)
+        previous_listings = previous.get('community_listings', []) if previous else []
+
+        if data.get('status') != 'success' and previous_listings:
+            # Don't replace real listings with a placeholder from a failed run
+            print(f"Fetch status {data.get('status')} - keeping existing {OUTPUT_PATH}", file=sys.stderr)
+            changes = unchanged_summary(previous_listings)
+            write_changes(changes, args.changes)
+            return changes
+
+        with span('merge'):
+            listings, changes = merge_listings(previous_listings, data.get('community_listings', []), run_started)
+        # Quiet runs are sightings too, so record them before deciding whether to write
+        if data.get('status') == 'success':
+            record_sightings(listings)
+        if previous and not changes['changed'] and previous.get('status') == data.get('status'):
+            write_changes(changes, args.changes)
+            print(f"✓ No listing changes - {OUTPUT_PATH} left untouched", file=sys.stderr)
+            return changes
+        changes = dict(changes, changed=True)
+        write_changes(changes, args.changes)
+
+        print(f"  {len(changes['added'])} added, {len(changes['removed'])} removed, "
+              f"{len(changes['updated'])} updated", file=sys.stderr)
+        data = dict(data, community_listings=listings)
+
+    if not args.merge and data.get('status') == 'success':
+        record_sightings(data['community_listings'])
 
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
 
     # Write JSON file
-    with open('data/rhizome.json', 'w') as f:
-        json.dump(data, f, indent=2)
+    with span('json_write') as record:
+        output = json.dumps(data, indent=2)
+        write_atomic(OUTPUT_PATH, output)
+        record['bytes'] = len(output)
+    annotate(written=True, listings=len(data.get('community_listings', [])))
 
-    print(f"✓ Created data/rhizome.json - Status: {data.get('status', 'unknown')}", file=sys.stderr)
+    print(f"✓ Created {OUTPUT_PATH} - Status: {data.get('status', 'unknown')}", file=sys.stderr)
     print(f"  Found {len(data.get('community_listings', []))} listing(s)", file=sys.stderr)
 
-    return 0
+    return changes if args.merge else None
 
 if __name__ == '__main__':
     sys.exit(main())
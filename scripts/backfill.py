@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Re-parse an archive of saved Rhizome community pages in parallel.
+
+Takes a directory (*.html, *.htm, optionally .gz) or a tarball of saved
+pages and parses them across a process pool with the current
+rhizome_rules.json. Each page's time comes from a date in its file name
+(2025-03-01, 20250301T120000, ...) or else its modification time. A
+listing without a date of its own gets the time it was first seen, as in
+merge_listings.py.
+
+Parsed pages are appended to <work-dir>/checkpoint.jsonl as they finish,
+so an interrupted run picks up where it stopped. Once every page is parsed
+they are replayed in time order into a ListingHistory in
+<work-dir>/history and a listings.json of every listing ever seen with its
+first/last sighting. A checkpoint from a different parser version is
+discarded.
+
+Usage:
+  python3 scripts/backfill.py pages/ [--workers 8]
+  python3 scripts/backfill.py rhizome-pages.tar.gz --work-dir /tmp/backfill
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import tarfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+
+from cloudflare import is_challenge_page
+from extraction_rules import extract_listings, load_rules
+from http_cache import DEFAULT_CACHE_DIR, write_atomic
+from listing_history import ListingHistory
+from merge_listings import CONTENT_FIELDS, is_placeholder_date, listing_id
+
+RHIZOME_RULES = load_rules('rhizome_rules')
+DEFAULT_WORK_DIR = os.path.join(DEFAULT_CACHE_DIR, 'backfill')
+PAGE_SUFFIXES = ('.html', '.htm', '.html.gz', '.htm.gz')
+# 2025-03-01, 20250301, 2025/03/01, optionally followed by a time of day
+NAME_DATE = re.compile(
+    r'(?<!\d)(\d{4})[-/_]?(\d{2})[-/_]?(\d{2})(?:[T_ -]?(\d{2})[:-]?(\d{2})(?:[:-]?(\d{2}))?)?(?!\d)'
+)
+
+
+def page_time(name, mtime):
+    """ISO timestamp for a saved page: a date in its name, else its mtime."""
+    match = NAME_DATE.search(name)
+    if match:
+        try:
+            parts = [int(p) if p else 0 for p in match.groups()]
+            return datetime(*parts, tzinfo=timezone.utc).isoformat()
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(mtime, timezone.utc).isoformat()
+
+
+def iter_pages(source):
+    """Yield (key, observed_at, path, data) for every saved page in source.
+
+    Directory pages are read by the worker from path; tarball members are
+    read here (a compressed tarball can only be read in order) and passed
+    as data.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(PAGE_SUFFIXES):
+                    path = os.path.join(root, name)
+                    key = os.path.relpath(path, source)
+                    yield key, page_time(key, os.path.getmtime(path)), path, None
+        return
+
+    with tarfile.open(source, 'r:*') as tar:
+        for member in tar:
+            if member.isfile() and member.name.lower().endswith(PAGE_SUFFIXES):
+                data = tar.extractfile(member).read()
+                yield member.name, page_time(member.name, member.mtime), None, data
+
+
+def parse_page(key, observed_at, path, data):
+    """Parse one saved page in a worker process; returns (key, observed_at, listings)."""
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    if key.lower().endswith('.gz'):
+        data = gzip.decompress(data)
+    html_content = data.decode('utf-8', errors='replace')
+    if is_challenge_page(html_content[:8192]):
+        return key, observed_at, []
+
+    listings = extract_listings(html_content, RHIZOME_RULES)
+    for listing in listings:
+        # Resolved to the first sighting once pages are in time order
+        if is_placeholder_date(listing.get('date')):
+            listing['date'] = None
+    return key, observed_at, listings
+
+
+class Checkpoint:
+    """Append-only record of parsed pages, valid for one parser version."""
+
+    def __init__(self, path, version, fresh=False):
+        self.path = path
+        self.version = version
+        self.done = {}
+
+        offset = 0
+        if not fresh and os.path.exists(path):
+            with open(path, 'rb') as f:
+                lines = f.readlines()
+            header = json.loads(lines[0]) if lines and lines[0].endswith(b'\n') else {}
+            if header.get('parser_version') == version:
+                for line in lines:
+                    # A torn last line is from an interrupted run; it is parsed again
+                    if not line.endswith(b'\n'):
+                        break
+                    if offset:
+                        entry = json.loads(line)
+                        self.done[entry['key']] = (entry['t'], entry['listings'])
+                    offset += len(line)
+            else:
+                print("Checkpoint is from another parser version, starting over", file=sys.stderr)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'ab' if offset else 'wb')
+        self.file.truncate(offset)
+        if not offset:
+            self._write({"parser_version": version})
+
+    def _write(self, entry):
+        self.file.write((json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8'))
+        self.file.flush()
+
+    def record(self, key, observed_at, listings):
+        self.done[key] = (observed_at, listings)
+        self._write({"key": key, "t": observed_at, "listings": listings})
+
+    def close(self):
+        self.file.close()
+
+
+def parse_all(source, checkpoint, workers):
+    """Parse every page not yet in the checkpoint, at most 4 per worker in flight."""
+    pending = set()
+    parsed = skipped = 0
+    started = time.perf_counter()
+
+    def collect(futures):
+        nonlocal parsed
+        for future in futures:
+            checkpoint.record(*future.result())
+            parsed += 1
+            if parsed % 100 == 0:
+                rate = parsed / (time.perf_counter() - started)
+                print(f"Parsed {parsed} page(s), {rate:.0f}/s", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for key, observed_at, path, data in iter_pages(source):
+            if key in checkpoint.done:
+                skipped += 1
+                continue
+            pending.add(pool.submit(parse_page, key, observed_at, path, data))
+            if len(pending) >= workers * 4:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending).done)
+
+    print(f"Parsed {parsed} page(s) in {time.perf_counter() - started:.1f}s, "
+          f"{skipped} already in the checkpoint", file=sys.stderr)
+
+
+def build_dataset(pages, history_dir):
+    """Replay (key, observed_at, listings) in time order into a history and a listing table."""
+    shutil.rmtree(history_dir, ignore_errors=True)
+    history = ListingHistory(history_dir)
+
+    listings = {}
+    for key, observed_at, page_listings in sorted(pages, key=lambda p: (p[1], p[0])):
+        if not page_listings:
+            continue
+        resolved = []
+        for listing in page_listings:
+            record = listings.setdefault(listing_id(listing), {"first_seen": observed_at, "sightings": 0})
+            listing = dict(listing, date=listing['date'] or record.get('date') or observed_at)
+            record.update({field: listing.get(field, '') for field in CONTENT_FIELDS + ('date',)})
+            record['last_seen'] = observed_at
+            record['sightings'] += 1
+            resolved.append(listing)
+        history.append(resolved, observed_at)
+
+    ordered = sorted(({"id": k, **v} for k, v in listings.items()), key=lambda l: (l['first_seen'], l['id']))
+    return ordered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-parse an archive of saved Rhizome pages in parallel')
+    parser.add_argument('source', help='directory or tarball of saved community pages')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='parser processes')
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR,
+                        help=f'checkpoint, history and listings.json location (default: {DEFAULT_WORK_DIR})')
+    parser.add_argument('--fresh', action='store_true', help='ignore any existing checkpoint')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        print(f"No such directory or tarball: {args.source}", file=sys.stderr)
+        return 1
+
+    checkpoint = Checkpoint(os.path.join(args.work_dir, 'checkpoint.jsonl'), RHIZOME_RULES.version, args.fresh)
+    try:
+        parse_all(args.source, checkpoint, args.workers)
+    finally:
+        checkpoint.close()
+
+    pages = [(key, t, listings) for key, (t, listings) in checkpoint.done.items()]
+    listings = build_dataset(pages, os.path.join(args.work_dir, 'history'))
+    output_path = os.path.join(args.work_dir, 'listings.json')
+    write_atomic(output_path, json.dumps({
+        "parser_version": RHIZOME_RULES.version,
+        "pages": len(pages),
+        "empty_pages": sum(1 for _, _, l in pages if not l),
+        "community_listings": listings,
+    }, indent=2))
+    print(f"✓ {len(listings)} distinct listing(s) from {len(pages)} page(s) written to {output_path}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -53,6 +53,16 @@ const crypto = safeReadJSON("data/crypto-prices.json", { coins: {}, last_updated
 
 const rhizome = safeReadJSON("data/rhizome.json", { community_listings: [], last_updated: "Never" });
 
+// Prebuilt search index over past listings and headlines (scripts/search_index.py)
+const searchManifest = safeReadJSON("data/search/manifest.json", null);
+if (searchManifest) {
+  fs.cpSync("data/search", "dist/search", {
+    recursive: true,
+    // keys.json is only used when updating the index
+    filter: (src) => !src.endsWith("keys.json"),
+  });
+}
+
 const nycTheme = fs.existsSync("theme-nyc.css")
   ? fs.readFileSync("theme-nyc.css", "utf-8")
   : "/* No NYC theme yet */";
@@ -694,6 +704,128 @@ const cryptoCard = `
   </div>
 `;
 
+// Build search card (results are fetched shard by shard in the browser)
+const searchCard = searchManifest
+  ? `
+  <div class="card">
+    <h2><span class="card-icon">🔎</span> Search the Archive</h2>
+    <input id="search-input" class="search-input" type="search" placeholder="Past Rhizome listings and NYT headlines" autocomplete="off">
+    <ul class="data-list" id="search-results"></ul>
+    <div class="timestamp">
+      ${searchManifest.live} items indexed · Updated: ${searchManifest.updated_at}
+    </div>
+  </div>
+`
+  : "";
+
+const searchScript = `
+    // Archive search over the sharded index in search/: one term shard per
+    // query word, then the doc shards of the top results
+    (() => {
+      const input = document.getElementById('search-input');
+      const results = document.getElementById('search-results');
+      if (!input) return;
+
+      const loaded = {};
+      let manifest = null;
+      let latest = 0;
+      let timer = null;
+
+      function load(path, version) {
+        const url = 'search/' + path + '.json?v=' + version;
+        if (!loaded[url]) {
+          loaded[url] = fetch(url).then(r => (r.ok ? r.json() : null)).catch(() => null);
+        }
+        return loaded[url];
+      }
+
+      // Same tokens as tokenize() in scripts/search_index.py
+      function tokenize(text, stopwords) {
+        const folded = text.normalize('NFKD').replace(/\\p{M}/gu, '').toLowerCase();
+        const tokens = (folded.match(/[a-z0-9]+/g) || []).filter(t => t.length > 1 && !stopwords.has(t));
+        return [...new Set(tokens)];
+      }
+
+      function escapeHtml(text) {
+        const entities = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+        return String(text).replace(/[&<>"']/g, c => entities[c]);
+      }
+
+      async function search(query) {
+        if (!manifest) {
+          manifest = await fetch('search/manifest.json', { cache: 'no-cache' }).then(r => r.json());
+        }
+        const tokens = tokenize(query, new Set(manifest.stopwords));
+        if (!tokens.length) return [];
+
+        const live = Math.max(1, manifest.live);
+        const shards = await Promise.all(tokens.map(token => {
+          const prefix = token.slice(0, manifest.prefix_length);
+          return manifest.term_shards[prefix] ? load('terms/' + prefix, manifest.term_shards[prefix]) : null;
+        }));
+
+        // Every query word must match; prefix matches count half
+        let scores = null;
+        tokens.forEach((token, i) => {
+          const matched = new Map();
+          for (const [term, postings] of Object.entries(shards[i] || {})) {
+            if (!term.startsWith(token)) continue;
+            const idf = Math.log(1 + live / (postings.length / 2));
+            const boost = term === token ? 1 : 0.5;
+            let id = 0;
+            for (let j = 0; j < postings.length; j += 2) {
+              id += postings[j];
+              matched.set(id, Math.max(matched.get(id) || 0, postings[j + 1] * idf * boost));
+            }
+          }
+          if (scores === null) {
+            scores = matched;
+          } else {
+            const both = new Map();
+            scores.forEach((score, id) => {
+              if (matched.has(id)) both.set(id, score + matched.get(id));
+            });
+            scores = both;
+          }
+        });
+
+        const deleted = new Set(manifest.deleted);
+        const ranked = [...scores]
+          .filter(([id]) => !deleted.has(id))
+          .sort((a, b) => b[1] - a[1] || b[0] - a[0])
+          .slice(0, 10);
+        const perShard = manifest.docs_per_shard;
+        const docs = await Promise.all(ranked.map(([id]) => {
+          const shard = Math.floor(id / perShard);
+          return load('docs/' + shard, manifest.doc_shards[shard]).then(rows => (rows ? rows[id % perShard] : null));
+        }));
+        return docs.filter(Boolean);
+      }
+
+      async function run(query) {
+        const ticket = ++latest;
+        const docs = await search(query).catch(() => []);
+        if (ticket !== latest) return;
+        if (!query.trim()) {
+          results.innerHTML = '';
+        } else if (!docs.length) {
+          results.innerHTML = '<li class="data-item"><span class="data-value">No matches</span></li>';
+        } else {
+          results.innerHTML = docs.map(([title, url, kind, date]) =>
+            '<li class="data-item"><a href="' + escapeHtml(url) + '" target="_blank" class="headline-link">' +
+            '<span class="data-label">' + escapeHtml(kind) + (date ? ' · ' + escapeHtml(date.slice(0, 10)) : '') + '</span>' +
+            '<span class="data-value">' + escapeHtml(title) + '</span></a></li>'
+          ).join('');
+        }
+      }
+
+      input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => run(input.value), 150);
+      });
+    })();
+`;
+
 const contentHtml =
   weatherCard +
   nytCard +
@@ -701,6 +833,7 @@ const contentHtml =
   glifWorkflowsCard +
   glifAgentsCard +
   cryptoCard +
+  searchCard +
   debugCard +
   statusCard;
 
@@ -960,6 +1093,16 @@ ${weatherAdaptiveTheme}
       font-size: 1.1rem;
     }
 
+    .search-input {
+      width: 100%;
+      padding: 0.6rem 0.8rem;
+      font-size: 1rem;
+      border: 1px solid var(--border-color, rgba(0,0,0,0.1));
+      border-radius: 8px;
+      background: var(--bg-secondary, #f5f5f7);
+      color: inherit;
+    }
+
     .weather-big {
       font-size: 3rem;
       font-weight: 700;
@@ -1256,7 +1399,7 @@ ${workflowsHtml}
         applyTheme('system');
       }
     });
-  </script>
+${searchManifest ? searchScript : ""}  </script>
 </body>
 </html>`;
 
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Record/replay cassettes for zero-network runs and repeatable timing.
+
+In record mode every response the shared HTTP client (http_client.py) or a
+Playwright browser context receives is captured; the cassette is written
+when the process exits. In replay mode the same requests are answered from
+the cassette and never reach the network; a request that was not recorded
+fails. Responses to the same method and URL are replayed in recorded order,
+the last one repeating.
+
+Replay can simulate a slower network: latency seconds before each response
+and a bandwidth cap in bytes per second while the body is read.
+
+A cassette is gzipped JSON lines, one interaction per line, with bodies
+stored decoded (as text when they are UTF-8, else base64).
+
+Enable with fetch_rhizome.py --record/--replay, or for any scraper with:
+  RHIZOME_CASSETTE=run.cassette.gz RHIZOME_CASSETTE_MODE=record python3 scripts/scrape_rhizome.py
+  RHIZOME_CASSETTE=run.cassette.gz RHIZOME_REPLAY_LATENCY=0.2 python3 scripts/scrape_rhizome.py
+"""
+
+import atexit
+import base64
+import gzip
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+from http_cache import write_atomic
+
+# These describe the wire encoding, not the decoded body that is stored
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode for a request the cassette has no answer for."""
+
+
+def make_headers(pairs):
+    headers = http.client.HTTPMessage()
+    for name, value in pairs:
+        headers[name] = value
+    return headers
+
+
+class ReplayResponse:
+    """A recorded response with the same interface as http_client.Response."""
+
+    def __init__(self, entry, body, bandwidth=None):
+        self.url = entry['url']
+        self.status = entry['status']
+        self.reason = entry.get('reason', '')
+        self.headers = make_headers(entry['headers'])
+        self.charset = self.headers.get_content_charset()
+        self.body = body
+        self.position = 0
+        self.bandwidth = bandwidth
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self.body) - self.position
+        data = self.body[self.position:self.position + size]
+        self.position += len(data)
+        if self.bandwidth and data:
+            time.sleep(len(data) / self.bandwidth)
+        return data
+
+    def text(self):
+        return self.read().decode(self.charset or 'utf-8', errors='replace')
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Cassette:
+    """Recorded interactions keyed by (method, URL)."""
+
+    def __init__(self, path, mode='replay', latency=0.0, bandwidth=None):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.entries = []
+        self.by_key = {}
+        self.served = {}
+        self.lock = threading.Lock()
+
+        if mode == 'replay':
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    self._add(json.loads(line))
+            print(f"Replaying {len(self.entries)} recorded response(s) from {path}", file=sys.stderr)
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def _add(self, entry):
+        self.entries.append(entry)
+        self.by_key.setdefault((entry['method'], entry['url']), []).append(entry)
+
+    def record(self, method, url, status, reason, headers, body, elapsed, source):
+        """Add one interaction and return it; headers is a list of (name, value) pairs."""
+        entry = {
+            "method": method, "url": url, "status": status, "reason": reason,
+            "headers": [[k, v] for k, v in headers if k.lower() not in DROPPED_HEADERS],
+            "elapsed": round(elapsed, 4), "source": source,
+        }
+        try:
+            entry['text'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['b64'] = base64.b64encode(body).decode('ascii')
+        with self.lock:
+            self._add(entry)
+        return entry
+
+    def lookup(self, method, url):
+        """The next recorded (entry, body) for a request; raises CassetteMiss."""
+        with self.lock:
+            recorded = self.by_key.get((method, url))
+            if not recorded:
+                raise CassetteMiss(f"No recorded response for {method} {url}")
+            n = self.served.get((method, url), 0)
+            self.served[(method, url)] = n + 1
+            entry = recorded[min(n, len(recorded) - 1)]
+        body = entry['text'].encode('utf-8') if 'text' in entry else base64.b64decode(entry['b64'])
+        return entry, body
+
+    def replay(self, method, url):
+        """A ReplayResponse for the request, after the injected latency."""
+        entry, body = self.lookup(method, url)
+        if self.latency:
+            time.sleep(self.latency)
+        return ReplayResponse(entry, body, self.bandwidth)
+
+    def save(self):
+        data = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in self.entries)
+        write_atomic(self.path, gzip.compress(data.encode('utf-8')), mode='wb')
+        print(f"Recorded {len(self.entries)} response(s) to {self.path}", file=sys.stderr)
+
+    def attach(self, target):
+        """Record or replay the traffic of a Playwright page or browser context."""
+        if self.replaying:
+            target.route('**/*', self._fulfill)
+        else:
+            target.on('response', self._capture)
+
+    def _fulfill(self, route):
+        request = route.request
+        try:
+            entry, body = self.lookup(request.method, request.url)
+        except CassetteMiss as e:
+            print(f"{e}, aborting it", file=sys.stderr)
+            route.abort()
+            return
+        delay = self.latency + (len(body) / self.bandwidth if self.bandwidth else 0)
+        if delay:
+            time.sleep(delay)
+        route.fulfill(status=entry['status'], headers=dict(entry['headers']), body=body)
+
+    def _capture(self, response):
+        request = response.request
+        try:
+            body = response.body()
+        except Exception:
+            # Redirects and aborted requests have no body to keep
+            body = b''
+        timing = request.timing
+        elapsed = max(0, timing.get('responseEnd', 0)) / 1000
+        self.record(request.method, request.url, response.status, response.status_text,
+                    list(response.headers.items()), body, elapsed, 'playwright')
+
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def activate(path, mode='replay', latency=0.0, bandwidth=None):
+    """Make a cassette the one every fetcher in this process uses."""
+    global _active
+    _active = Cassette(path, mode, latency, bandwidth)
+    if mode == 'record':
+        atexit.register(_active.save)
+    return _active
+
+
+def active():
+    """The active cassette, configured from RHIZOME_CASSETTE* on first use, or None."""
+    if _active is None and os.environ.get('RHIZOME_CASSETTE'):
+        with _active_lock:
+            if _active is None:
+                activate(
+                    os.environ['RHIZOME_CASSETTE'],
+                    os.environ.get('RHIZOME_CASSETTE_MODE', 'replay'),
+                    float(os.environ.get('RHIZOME_REPLAY_LATENCY') or 0),
+                    float(os.environ.get('RHIZOME_REPLAY_BANDWIDTH') or 0) or None,
+                )
+    return _active
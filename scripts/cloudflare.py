@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Early Cloudflare-challenge detection and a circuit breaker for blocked methods.
+
+A challenge is recognised from the status and headers (403/503 with
+cf-mitigated: challenge) or from the first few KB of the body, so callers
+can abort the transfer instead of downloading and scanning the whole page.
+CircuitBreaker remembers consecutive challenges per fetch method in
+.cache/rhizome/circuit-breakers.json and skips a method for a cooldown
+window once it has been challenged threshold times in a row.
+"""
+
+import json
+import os
+import sys
+import time
+
+from http_cache import DEFAULT_CACHE_DIR, write_atomic
+
+CHALLENGE_MARKERS = ('Just a moment', 'challenge-platform', 'Enable JavaScript and cookies')
+# The markers all sit in the <head> or top of <body> of the interstitial
+HEAD_BYTES = 8 * 1024
+BREAKERS_PATH = os.path.join(DEFAULT_CACHE_DIR, 'circuit-breakers.json')
+
+# Returned by a fetcher when it was served a challenge or its breaker is open
+CHALLENGED = object()
+
+
+def is_challenge_page(html_content):
+    """Check whether html_content is a Cloudflare challenge instead of the page."""
+    return any(marker in html_content for marker in CHALLENGE_MARKERS)
+
+
+def is_challenge_response(status, headers):
+    """Check status and headers alone, before any of the body is read."""
+    headers = {k.lower(): v for k, v in dict(headers).items()}
+    if headers.get('cf-mitigated', '').lower() == 'challenge':
+        return True
+    return status in (403, 503) and 'cloudflare' in headers.get('server', '').lower()
+
+
+def read_head(read, head_bytes=HEAD_BYTES):
+    """Read up to head_bytes via read(n), returning the bytes read."""
+    head = b''
+    while len(head) < head_bytes:
+        chunk = read(head_bytes - len(head))
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+
+class CircuitBreaker:
+    """Skip a fetch method for cooldown seconds after threshold consecutive challenges."""
+
+    def __init__(self, name, threshold=3, cooldown=24 * 3600, path=BREAKERS_PATH):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update(self, state):
+        breakers = self._load()
+        breakers[self.name] = state
+        write_atomic(self.path, json.dumps(breakers, indent=2))
+
+    def allow(self):
+        """True unless the breaker is open; prints why a method is skipped."""
+        state = self._load().get(self.name) or {}
+        open_until = state.get('open_until', 0)
+        if open_until > time.time():
+            remaining = (open_until - time.time()) / 3600
+            print(f"Skipping {self.name}: challenged {state.get('failures', 0)} times in a row, "
+                  f"circuit open for another {remaining:.1f}h", file=sys.stderr)
+            return False
+        return True
+
+    def record_challenge(self):
+        state = self._load().get(self.name) or {}
+        failures = state.get('failures', 0) + 1
+        state = {"failures": failures, "open_until": 0}
+        if failures >= self.threshold:
+            state['open_until'] = time.time() + self.cooldown
+            print(f"Opening circuit for {self.name} after {failures} consecutive challenges", file=sys.stderr)
+        self._update(state)
+
+    def record_success(self):
+        if self._load().get(self.name):
+            self._update({"failures": 0, "open_until": 0})
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Refresh every data feed concurrently.
+
+scripts/sources.json lists each source (Rhizome, NYT headlines, weather,
+crypto prices, Glif) with the request(s) it needs, how to extract fields
+from each response and the data/*.json file it writes. Requests run on one
+thread pool through the shared HTTP client, so a full refresh takes about
+as long as the slowest source rather than the sum of all of them.
+
+Politeness is per host: each host allows `concurrency` requests in flight
+and spaces request starts `delay` seconds apart (the "hosts" section, with
+a "default" entry for unlisted hosts). Requests are queued round-robin
+across hosts so one slow host can't hold every worker.
+
+Responses are parsed as they stream in (see feed_transforms.py for the
+extraction formats) and revalidated with ETag/Last-Modified; a source whose
+requests all come back 304 keeps its file as it is. Every file is checked
+against its source's "schema" first, and a source that fails (HTTP error,
+Cloudflare challenge, nothing extracted, schema mismatch) never overwrites
+its file. Files are replaced atomically. "${VAR}" in a header is read from
+the environment; the header is dropped when VAR is unset. A source with
+"price_history" also appends its coins to that price_history.py directory,
+and one with "search_index" adds its items to that search_index.py index.
+Replaying a cassette (RHIZOME_CASSETTE, see cassette.py) gives a
+deterministic offline run.
+
+Usage:
+  python3 scripts/crawl.py                  # every source
+  python3 scripts/crawl.py weather crypto   # just these
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from cloudflare import is_challenge_response
+from feed_transforms import PARSERS, TransformError, assemble, validate
+from http_cache import ValidatorCache, write_atomic
+from http_client import CHUNK_SIZE, FetchError, default_client
+from merge_listings import load_previous, merge_listings
+from run_metrics import span
+from run_metrics import start as start_metrics
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.normpath(os.path.join(SCRIPTS_DIR, '..'))
+CONFIG_PATH = os.path.join(SCRIPTS_DIR, 'sources.json')
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+ENV_REFERENCE = re.compile(r'\$\{(\w+)\}')
+
+
+class CrawlError(Exception):
+    """A source request or extraction failed."""
+
+
+class HostLimiter:
+    """Per-host cap on in-flight requests plus a minimum gap between request starts."""
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.slots = {}
+        self.next_start = {}
+        self.lock = threading.Lock()
+
+    def settings(self, host):
+        return self.hosts.get(host) or self.hosts.get('default') or {}
+
+    @contextmanager
+    def slot(self, host):
+        settings = self.settings(host)
+        with self.lock:
+            if host not in self.slots:
+                self.slots[host] = threading.BoundedSemaphore(settings.get('concurrency', 1))
+            semaphore = self.slots[host]
+
+        with semaphore:
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, self.next_start.get(host, now))
+                self.next_start[host] = start + settings.get('delay', 0)
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def config_digest(source):
+    return hashlib.sha1(json.dumps(source, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def expand_headers(headers):
+    """Fill in ${VAR} references, dropping headers whose variables are unset."""
+    expanded = {}
+    for name, value in (headers or {}).items():
+        missing = [var for var in ENV_REFERENCE.findall(value) if not os.environ.get(var)]
+        if missing:
+            print(f"  {', '.join(missing)} not set - sending no {name} header", file=sys.stderr)
+            continue
+        expanded[name] = ENV_REFERENCE.sub(lambda m: os.environ[m.group(1)], value)
+    return expanded
+
+
+def fetch_part(name, part, headers, limiter, cache):
+    """Fetch one request of a source, parsing it as it streams in.
+
+    Returns (value, body, not_modified).
+    """
+    url = part['url']
+    request_headers = {'User-Agent': USER_AGENT}
+    request_headers.update(headers)
+    request_headers.update(cache.conditional_headers(url))
+    feed, finish = PARSERS[part['format']](part)
+
+    host = urlsplit(url).hostname
+    with span('crawl', source=name, host=host) as record, limiter.slot(host):
+        try:
+            with default_client().get(url, headers=request_headers) as response:
+                record['status'] = response.status
+                not_modified = response.status == 304
+                if not_modified:
+                    body = cache.cached_body(url)
+                    if body is None:
+                        raise CrawlError("304 without a cached body")
+                    body = body.encode('utf-8')
+                    feed(body)
+                elif is_challenge_response(response.status, response.headers):
+                    raise CrawlError("served a Cloudflare challenge")
+                elif response.status != 200:
+                    raise CrawlError(f"HTTP {response.status} {response.reason}")
+                else:
+                    chunks = []
+                    while True:
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        chunks.append(chunk)
+                        feed(chunk)
+                    body = b''.join(chunks)
+                    record['bytes'] = len(body)
+            value = finish()
+        except FetchError as e:
+            raise CrawlError(str(e)) from e
+        except TransformError as e:
+            raise CrawlError(f"could not parse {url}: {e}") from e
+        record['items'] = len(value)
+
+    if not value:
+        raise CrawlError(f"nothing extracted from {url}")
+    if not not_modified:
+        cache.store(url, response.headers, body)
+    return value, body, not_modified
+
+
+def write_source(name, source, results, root, run_started):
+    """Assemble, check and write a source's file; returns a short outcome.
+
+    Raises CrawlError when the assembled file doesn't match the schema.
+    """
+    output = os.path.join(root, source['output'])
+    if all(not_modified for _, _, not_modified in results) and os.path.exists(output):
+        return 'not modified'
+
+    data = assemble(source, [value for value, _, _ in results], run_started.isoformat())
+    merge_key = source.get('merge')
+    if merge_key:
+        previous = load_previous(output)
+        listings, changes = merge_listings((previous or {}).get(merge_key, []), data[merge_key], run_started)
+        if previous and not changes['changed'] and previous.get('status') == data.get('status'):
+            return 'unchanged'
+        data[merge_key] = listings
+
+    errors = validate(data, source.get('schema', {}))
+    if errors:
+        more = f" (+{len(errors) - 3} more)" if len(errors) > 3 else ''
+        raise CrawlError(f"schema mismatch: {'; '.join(errors[:3])}{more}")
+
+    with span('write', source=name) as record:
+        for part, (_, body, _) in zip(source['parts'], results):
+            if part.get('raw_output'):
+                write_atomic(os.path.join(root, part['raw_output']), body, mode='wb')
+        text = json.dumps(data, indent=2) + '\n'
+        write_atomic(output, text)
+        record['bytes'] = len(text)
+    if source.get('price_history'):
+        from price_history import PriceHistory
+
+        PriceHistory(os.path.join(root, source['price_history'])).append_snapshot(data)
+    if source.get('search_index'):
+        from search_index import update as update_search_index
+
+        update_search_index([output], os.path.join(root, source['search_index']))
+    return f"wrote {source['output']}"
+
+
+def interleave(tasks):
+    """Order (name, index, part) tasks round-robin by host."""
+    by_host = {}
+    for task in tasks:
+        by_host.setdefault(urlsplit(task[2]['url']).hostname, []).append(task)
+    queues = list(by_host.values())
+    ordered = []
+    while queues:
+        ordered.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def crawl(sources, hosts, concurrency=8, root=ROOT_DIR):
+    """Fetch sources concurrently; returns {name: (ok, outcome, seconds)}."""
+    run_started = datetime.now(timezone.utc)
+    limiter = HostLimiter(hosts)
+    # Keyed on the source's config too, so editing its extraction isn't skipped by a 304
+    caches = {name: ValidatorCache(f"crawl:{name}:{config_digest(source)}") for name, source in sources.items()}
+    started = time.perf_counter()
+
+    headers = {name: expand_headers(source.get('headers')) for name, source in sources.items()}
+    pending = {name: len(source['parts']) for name, source in sources.items()}
+    results = {name: [None] * len(source['parts']) for name, source in sources.items()}
+    failed = {}
+    outcomes = {}
+
+    tasks = interleave([(name, index, part) for name, source in sources.items()
+                        for index, part in enumerate(source['parts'])])
+    client = default_client()
+    client.pool_size = max(client.pool_size, concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='crawl') as pool:
+        futures = {pool.submit(fetch_part, name, part, headers[name], limiter, caches[name]): (name, index)
+                   for name, index, part in tasks}
+        for future in as_completed(futures):
+            name, index = futures[future]
+            try:
+                results[name][index] = future.result()
+            except CrawlError as e:
+                failed.setdefault(name, f"{sources[name]['parts'][index]['url']}: {e}")
+            pending[name] -= 1
+            if pending[name]:
+                continue
+
+            # Every request of this source is in: write it without waiting for the rest
+            seconds = time.perf_counter() - started
+            if name in failed:
+                outcomes[name] = (False, failed[name], seconds)
+                print(f"✗ {name}: {failed[name]} - keeping the existing file", file=sys.stderr)
+                continue
+            try:
+                outcome = write_source(name, sources[name], results[name], root, run_started)
+            except CrawlError as e:
+                outcomes[name] = (False, str(e), seconds)
+                print(f"✗ {name}: {e} - keeping the existing file", file=sys.stderr)
+                continue
+            outcomes[name] = (True, outcome, seconds)
+            print(f"✓ {name}: {outcome} ({seconds:.2f}s)", file=sys.stderr)
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh data feeds concurrently from scripts/sources.json')
+    parser.add_argument('sources', nargs='*', help='source names to refresh (default: all)')
+    parser.add_argument('--config', default=CONFIG_PATH, help='sources file')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight across all hosts')
+    parser.add_argument('--root', default=ROOT_DIR, help='directory output paths are relative to')
+    parser.add_argument('--metrics', metavar='PATH', help='append per-source timing spans to this JSONL file')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    sources = config['sources']
+    unknown = [name for name in args.sources if name not in sources]
+    if unknown:
+        parser.error(f"unknown source(s): {', '.join(unknown)} (have {', '.join(sources)})")
+    if args.sources:
+        sources = {name: sources[name] for name in args.sources}
+
+    metrics = start_metrics('crawl') if args.metrics else None
+    outcomes = crawl(sources, config.get('hosts', {}), concurrency=args.concurrency, root=args.root)
+    ok = [name for name, (succeeded, _, _) in outcomes.items() if succeeded]
+    slowest = max(outcomes, key=lambda name: outcomes[name][2])
+    print(f"Crawled {len(ok)}/{len(outcomes)} source(s); slowest was {slowest} "
+          f"({outcomes[slowest][2]:.2f}s)", file=sys.stderr)
+    if metrics:
+        metrics.annotate(succeeded=ok, failed=[name for name in outcomes if name not in ok])
+        metrics.append(args.metrics)
+
+    # Partial success still refreshed something worth committing
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Enrich Rhizome community listings from their detail pages.
+
+The index page only gives titles and links, so descriptions are often
+empty and dates are the fetch time. This fetches every listing's detail
+page concurrently (bounded by a semaphore, over the shared keep-alive
+connection pool in http_client.py, each request with its own deadline) and fills in description,
+canonical URL, type and posting date from rhizome_detail_rules.json.
+"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction_rules import extract_listings, load_rules
+from http_client import default_client
+
+DETAIL_RULES = load_rules('rhizome_detail_rules')
+DETAIL_FIELDS = ('description', 'url', 'type', 'date')
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+
+
+def fetch_detail(client, url, deadline):
+    with client.get(url, headers=HEADERS, connect_timeout=min(5, deadline), read_timeout=deadline) as response:
+        if response.status != 200:
+            raise ValueError(f"HTTP {response.status} {response.reason}")
+        return response.text()
+
+
+def merge_detail(listing, detail):
+    """Overlay the non-empty detail-page fields onto a listing."""
+    enriched = dict(listing)
+    for field in DETAIL_FIELDS:
+        if detail.get(field):
+            enriched[field] = detail[field]
+    return enriched
+
+
+async def enrich_all(listings, client, concurrency, deadline):
+    # Blocking requests run in worker threads; size the pool to the concurrency
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def enrich_one(listing):
+        url = listing.get('url') or ''
+        # The index URL is the placeholder for "no detail page"
+        if not url or url.rstrip('/') == DETAIL_RULES.base_url.rstrip('/'):
+            return listing, False
+
+        async with semaphore:
+            try:
+                html_content = await asyncio.wait_for(
+                    asyncio.to_thread(fetch_detail, client, url, deadline), deadline
+                )
+            except asyncio.TimeoutError:
+                print(f"Detail page timed out after {deadline}s: {url}", file=sys.stderr)
+                return listing, False
+            except Exception as e:
+                print(f"Detail page error for {url}: {e}", file=sys.stderr)
+                return listing, False
+
+        details = extract_listings(html_content, DETAIL_RULES)
+        if not details:
+            return listing, False
+        return merge_detail(listing, details[0]), True
+
+    return await asyncio.gather(*(enrich_one(listing) for listing in listings))
+
+
+def enrich_listings(listings, concurrency=8, deadline=10.0):
+    """Return listings with detail-page fields filled in, in the same order.
+
+    Listings whose detail page fails or times out are returned unchanged.
+    """
+    client = default_client()
+    # Keep every worker's connection alive between detail pages
+    client.pool_size = max(client.pool_size, concurrency)
+
+    started = time.perf_counter()
+    results = asyncio.run(enrich_all(listings, client, concurrency, deadline))
+
+    enriched = sum(1 for _, ok in results if ok)
+    print(f"Enriched {enriched}/{len(listings)} listing(s) in {time.perf_counter() - started:.2f}s",
+          file=sys.stderr)
+    return [listing for listing, _ in results]
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Declarative listing-extraction rules shared by the Rhizome scrapers.
+
+A rule spec (see rhizome_rules.json) names a container selector and one
+selector per field. compile_rules() turns it into a CompiledRules object
+once, which can then run on any backend:
+
+- extract_listings() / RuleScanner: stdlib only. A regex compiled from the
+  container selector finds each container's start tag and element_end()
+  finds where it closes, so only container markup goes through
+  RuleParser (HTMLParser) and the rest of the page is never tokenized
+- extract_from_soup(): BeautifulSoup tree, via precompiled soupsieve CSS
+- to_browser() + EXTRACT_JS: querySelectorAll inside a Playwright page
+
+Selectors are a small CSS subset: comma-separated alternatives of
+``tag``, ``.class``, ``[attr]``, ``[attr=value]`` or ``[attr^=value]``,
+combined as ``tag.class[attr^=value]``. Class matching is a
+whole-token test as in CSS, so ``li.item`` matches ``class="item new"``
+but not ``class="menu-item"``.
+
+Each field takes the first element matching its selector, checking the
+container itself before its descendants. A field with ``attr`` (a name or
+a list of names, first present wins) reads that attribute and falls back
+to the element text; text is whitespace-collapsed. A "$now" default is
+filled in with the parse time as a ParseTime, so later stages can tell it
+from a date read off the page.
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+with open(os.path.abspath(__file__), 'rb') as _f:
+    # Any edit to the parser code counts as a new parser version
+    PARSER_SOURCE_HASH = hashlib.sha1(_f.read()).hexdigest()
+
+# Elements that never get an end tag, so they must not go on the tag stack
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'source', 'track', 'wbr',
+}
+
+SIMPLE_SELECTOR = re.compile(
+    r'^(?P<tag>[a-z][a-z0-9]*)?'
+    r'(?:\.(?P<cls>[\w-]+))?'
+    r'(?:\[(?P<attr>[\w-]+)(?:(?P<op>\^?=)(?P<value>[^\]]+))?\])?$'
+)
+ANY_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)(?=[\s/>])[^>]*>')
+RAW_TEXT_END = {
+    'script': re.compile(r'</script\s*>', re.IGNORECASE),
+    'style': re.compile(r'</style\s*>', re.IGNORECASE),
+}
+
+# A container still open after this many characters is cut off there, so
+# unbalanced HTML cannot make RuleScanner hold the rest of the page
+MAX_CONTAINER_CHARS = 64 * 1024
+
+
+def start_tag_pattern(tag, cls, attr, op, value):
+    """Regex for complete start tags that may match one selector alternative.
+
+    Loose about quoting, so it can match more than CompiledSelector.matches()
+    does but never less; RuleParser checks the tag again.
+    """
+    pattern = f'<(?i:{re.escape(tag)})' if tag else r'<[a-zA-Z][\w-]*'
+    pattern += r'(?=[\s/>])'
+    if cls:
+        pattern += rf'(?=[^>]*?\s(?i:class)\s*=\s*["\']?(?:[^"\'>]*?\s)?{re.escape(cls)}(?=[\s"\'>]))'
+    if attr:
+        pattern += rf'(?=[^>]*?\s(?i:{re.escape(attr)})'
+        if op:
+            pattern += rf'\s*=\s*["\']?{re.escape(value)}'
+            if op == '=':
+                pattern += r'(?=[\s"\'>])'
+        else:
+            pattern += r'(?=[\s=/>])'
+        pattern += ')'
+    return pattern + '[^>]*>'
+
+
+def element_end(html_content, start, state):
+    """Offset where the element opened at start ends, or None if not in html_content yet.
+
+    It ends after its own end tag, or before an end tag for an element it
+    does not contain, i.e. where its parent closes. Script and style bodies
+    are skipped whole. state is a dict carrying the scan between calls on
+    the same text with more appended, so nothing is scanned twice.
+    """
+    stack = state.setdefault('stack', [])
+    pos = start + state.get('offset', 0)
+    while True:
+        m = ANY_TAG.search(html_content, pos)
+        if not m:
+            break
+        name = m.group(2).lower()
+        if m.group(1):
+            if name not in stack:
+                return m.start()
+            del stack[len(stack) - 1 - stack[::-1].index(name):]
+            if not stack:
+                return m.end()
+        elif name in RAW_TEXT_END:
+            body_end = RAW_TEXT_END[name].search(html_content, m.end())
+            if not body_end:
+                break
+            pos = body_end.end()
+            continue
+        elif name not in VOID_ELEMENTS and not m.group(0).endswith('/>'):
+            stack.append(name)
+        pos = m.end()
+    state['offset'] = pos - start
+    return None
+
+
+class ParseTime(str):
+    """An ISO timestamp filled in by a "$now" default rather than read from the page."""
+
+
+def first_attr(get, names):
+    """Return the first attribute in names that get() finds, or None."""
+    for name in names:
+        value = get(name)
+        if value is not None:
+            return value
+    return None
+
+
+class CompiledSelector:
+    """A selector compiled to tuple tests for the stdlib backend and CSS for the others."""
+
+    def __init__(self, selector):
+        self.source = selector
+        self.alternatives = []
+        css = []
+        patterns = []
+        literals = set()
+        markers = set()
+        for part in selector.split(','):
+            part = part.strip()
+            m = SIMPLE_SELECTOR.match(part)
+            if not part or not m:
+                raise ValueError(f"Unsupported selector: {part!r} in {selector!r}")
+            tag, cls, attr, op, value = m.group('tag', 'cls', 'attr', 'op', 'value')
+            if value:
+                value = value.strip('"\'')
+            self.alternatives.append((tag, cls, attr, op, value))
+            patterns.append(start_tag_pattern(tag, cls, attr, op, value))
+            # Text any matching tag must contain, to find candidates by
+            if cls or value:
+                literals.add(cls or value)
+            elif tag:
+                markers.add(f'<(?i:{re.escape(tag)})')
+            else:
+                markers.add(rf'\s(?i:{re.escape(attr)})')
+
+            compiled = tag or ''
+            if cls:
+                compiled += f'[class~="{cls}"]'
+            if attr:
+                compiled += f'[{attr}{op}"{value}"]' if op else f'[{attr}]'
+            css.append(compiled or '*')
+        self.css = ', '.join(css)
+        self.start_tag = re.compile('|'.join(patterns))
+        # Searched one at a time: a lone literal is found far faster than an
+        # alternation, and a literal containing another one adds nothing
+        literals = {literal for literal in literals if not any(other != literal and other in literal
+                                                               for other in literals)}
+        self.markers = [re.compile(re.escape(literal)) for literal in sorted(literals)]
+        self.markers += [re.compile(marker) for marker in sorted(markers)]
+        self._soupsieve = None
+
+    def matches(self, tag, attrs):
+        """Test a start tag and its attribute dict against the selector."""
+        for want_tag, cls, attr, op, value in self.alternatives:
+            if want_tag and want_tag != tag:
+                continue
+            if cls and cls not in (attrs.get('class') or '').split():
+                continue
+            if attr:
+                actual = attrs.get(attr)
+                if actual is None:
+                    continue
+                if op == '=' and actual != value:
+                    continue
+                if op == '^=' and not actual.startswith(value):
+                    continue
+            return True
+        return False
+
+    def find_start_tag(self, html_content, pos=0):
+        """The first start tag at or after pos that may match, as a match object, or None."""
+        found = None
+        for marker in self.markers:
+            for hit in marker.finditer(html_content, pos):
+                if found and hit.start() >= found.start():
+                    break
+                # The marker has to sit inside a tag
+                start = html_content.rfind('<', pos, hit.start() + 1)
+                if start < 0 or html_content.find('>', start, hit.start()) >= 0:
+                    continue
+                m = self.start_tag.match(html_content, start)
+                if m:
+                    found = m
+                    break
+        return found
+
+    @property
+    def soupsieve(self):
+        """The selector precompiled by soupsieve (imported lazily with bs4)."""
+        if self._soupsieve is None:
+            import soupsieve
+            self._soupsieve = soupsieve.compile(self.css)
+        return self._soupsieve
+
+
+class CompiledRules:
+    """A rule spec with every selector compiled, plus record finishing."""
+
+    def __init__(self, spec):
+        self.name = spec.get('name', 'rules')
+        # Changes with the spec or the parser code, so memoized parses go stale
+        spec_json = json.dumps(spec, sort_keys=True)
+        self.version = hashlib.sha1(f"{PARSER_SOURCE_HASH}:{spec_json}".encode('utf-8')).hexdigest()[:12]
+        self.base_url = spec.get('base_url', '')
+        self.limit = spec.get('limit', 15)
+        self.container = CompiledSelector(spec['container'])
+        self.fields = []
+        for name, field in spec['fields'].items():
+            attr = field.get('attr') or []
+            field = dict(field, attr=[attr] if isinstance(attr, str) else list(attr))
+            self.fields.append((name, CompiledSelector(field['select']), field))
+
+    def is_valid(self, raw):
+        """Check that every required field of a raw record is long enough."""
+        return all(len(raw.get(name) or '') >= field.get('min_length', 1)
+                   for name, _, field in self.fields if field.get('required'))
+
+    def finish(self, raw):
+        """Validate a raw {field: text} record and apply defaults; None if invalid."""
+        if not self.is_valid(raw):
+            return None
+
+        record = {}
+        for name, selector, field in self.fields:
+            value = raw.get(name) or ''
+            if value and field.get('max_length'):
+                value = value[:field['max_length']]
+            if value and field.get('absolute'):
+                value = urljoin(self.base_url, value)
+            if not value and 'default' in field:
+                value = field['default']
+                if value == '$now':
+                    value = ParseTime(datetime.now(timezone.utc).isoformat())
+            record[name] = value
+        return record
+
+    def finish_all(self, raw_records):
+        """Finish raw records in order, keeping at most limit valid ones."""
+        listings = []
+        for raw in raw_records:
+            record = self.finish(raw)
+            if record:
+                listings.append(record)
+                if len(listings) >= self.limit:
+                    break
+        return listings
+
+    def to_browser(self):
+        """The rules as a JSON-able argument for EXTRACT_JS."""
+        return {
+            "container": self.container.css,
+            "limit": self.limit,
+            "fields": {name: {"select": selector.css, "attr": field.get('attr')}
+                       for name, selector, field in self.fields},
+            "required": {name: field.get('min_length', 1)
+                         for name, _, field in self.fields if field.get('required')},
+        }
+
+
+def compile_rules(spec):
+    return CompiledRules(spec)
+
+
+def load_rules(name):
+    """Load and compile <name>.json from the scripts directory."""
+    with open(os.path.join(RULES_DIR, f"{name}.json")) as f:
+        return compile_rules(json.load(f))
+
+
+class RuleParser(HTMLParser):
+    """Single-pass HTMLParser backend for CompiledRules.
+
+    Listings are collected as their containers close. Once limit (by
+    default the rules' own) valid listings are complete, done is set and further input is ignored, so
+    callers feeding chunks can stop reading. The tag stack is bounded by
+    max_depth however unbalanced the HTML is.
+    """
+
+    def __init__(self, rules, limit=None, max_depth=256):
+        super().__init__()
+        self.rules = rules
+        self.limit = limit or rules.limit
+        self.max_depth = max_depth
+        self.listings = []
+        self.stack = []         # (tag, serial) of open elements
+        self.serial = 0
+        self.container = None   # serial of the open container
+        self.raw = {}
+        self.capturing = {}     # field name -> (serial, text pieces)
+
+    @property
+    def done(self):
+        return len(self.listings) >= self.limit
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+
+        attrs = dict(attrs)
+        self.serial += 1
+        serial = self.serial
+        if tag not in VOID_ELEMENTS:
+            self.stack.append((tag, serial))
+            if len(self.stack) > self.max_depth:
+                self._close(self.stack.pop(0)[1])
+
+        if self.container is None:
+            if not self.rules.container.matches(tag, attrs):
+                return
+            self.container = serial
+            self.raw = {}
+            self.capturing = {}
+
+        for name, selector, field in self.rules.fields:
+            if name in self.raw or name in self.capturing or not selector.matches(tag, attrs):
+                continue
+            value = first_attr(attrs.get, field['attr'])
+            if value is not None:
+                self.raw[name] = value.strip()
+            elif tag not in VOID_ELEMENTS:
+                self.capturing[name] = (serial, [])
+
+    def handle_endtag(self, tag):
+        # Unwind to the matching open tag, implicitly closing anything left open
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                for _, serial in reversed(self.stack[i:]):
+                    self._close(serial)
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        for _, pieces in self.capturing.values():
+            pieces.append(data)
+
+    def _close(self, serial):
+        for name, (field_serial, pieces) in list(self.capturing.items()):
+            if field_serial == serial:
+                self.raw[name] = ' '.join(''.join(pieces).split())
+                del self.capturing[name]
+
+        if serial == self.container:
+            self.container = None
+            record = self.rules.finish(self.raw)
+            if record and not self.done:
+                self.listings.append(record)
+
+    def close(self):
+        super().close()
+        for _, serial in reversed(self.stack):
+            self._close(serial)
+        self.stack = []
+
+    def get_listings(self):
+        return self.listings[:self.limit]
+
+
+class RuleScanner:
+    """Incremental stdlib backend that only hands container markup to RuleParser.
+
+    Text between containers is skipped with CompiledSelector.find_start_tag()
+    instead of being tokenized, which is what makes large pages cheap. A
+    container whose end tag never comes ends where its parent closes, or
+    failing that at the next container start once input ends or
+    MAX_CONTAINER_CHARS have gone by. Same feed/close/done/get_listings
+    interface as RuleParser, so callers can stop reading once done is set.
+    """
+
+    def __init__(self, rules, limit=None, max_depth=256):
+        self.rules = rules
+        self.limit = limit or rules.limit
+        self.max_depth = max_depth
+        self.listings = []
+        self.buffer = ''
+        self.pending = {}
+
+    @property
+    def done(self):
+        return len(self.listings) >= self.limit
+
+    def feed(self, text):
+        if not self.done:
+            self.buffer += text
+            self._scan(final=False)
+
+    def close(self):
+        self._scan(final=True)
+        self.buffer = ''
+
+    def _scan(self, final):
+        buffer = self.buffer
+        container = self.rules.container
+        pos = 0
+        while not self.done:
+            m = container.find_start_tag(buffer, pos)
+            if not m:
+                # Keep a start tag that may still be arriving
+                tail = -1 if final else buffer.rfind('<', pos)
+                pos = tail if tail >= 0 else len(buffer)
+                break
+            end = element_end(buffer, m.start(), self.pending)
+            if end is None:
+                cap = m.start() + MAX_CONTAINER_CHARS
+                if not final and len(buffer) < cap:
+                    # The end tag may still be arriving
+                    pos = m.start()
+                    break
+                following = container.find_start_tag(buffer, m.end())
+                end = min(following.start() if following else len(buffer), cap)
+            self.pending = {}
+            parser = RuleParser(self.rules, limit=self.limit - len(self.listings), max_depth=self.max_depth)
+            parser.feed(buffer[m.start():end])
+            parser.close()
+            self.listings.extend(parser.get_listings())
+            pos = end
+        self.buffer = buffer[pos:]
+
+    def get_listings(self):
+        return self.listings[:self.limit]
+
+
+def extract_listings(html_content, rules):
+    """Run rules over an HTML string with the stdlib backend."""
+    scanner = RuleScanner(rules)
+    scanner.feed(html_content)
+    if not scanner.done:
+        scanner.close()
+    return scanner.get_listings()
+
+
+def extract_from_soup(soup, rules):
+    """Run rules over a BeautifulSoup tree using precompiled soupsieve selectors."""
+    raw_records = []
+    seen = set()
+    valid = 0
+    for element in rules.container.soupsieve.select(soup):
+        # Outermost container wins, as in the stdlib backend
+        if any(id(parent) in seen for parent in element.parents):
+            continue
+        seen.add(id(element))
+
+        raw = {}
+        for name, selector, field in rules.fields:
+            match = element if selector.soupsieve.match(element) else selector.soupsieve.select_one(element)
+            if match is None:
+                continue
+            value = first_attr(match.get, field['attr'])
+            raw[name] = value.strip() if value is not None else ' '.join(match.get_text().split())
+        raw_records.append(raw)
+
+        if rules.is_valid(raw):
+            valid += 1
+            if valid >= rules.limit:
+                break
+    return rules.finish_all(raw_records)
+
+
+# Runs inside a Playwright page with rules.to_browser() as its argument.
+# Returns raw records for finish_all(), or null when a challenge page is showing.
+EXTRACT_JS = """
+(rules) => {
+  const text = document.body ? document.body.innerText : '';
+  if (document.title.includes('Just a moment') ||
+      document.querySelector('script[src*="challenge-platform"]') ||
+      text.includes('Enable JavaScript and cookies')) {
+    return null;
+  }
+  const records = [];
+  const seen = new Set();
+  let valid = 0;
+  for (const element of document.querySelectorAll(rules.container)) {
+    if (valid >= rules.limit) break;
+    let parent = element.parentElement;
+    while (parent && !seen.has(parent)) parent = parent.parentElement;
+    if (parent) continue;
+    seen.add(element);
+
+    const raw = {};
+    for (const [name, field] of Object.entries(rules.fields)) {
+      const match = element.matches(field.select) ? element : element.querySelector(field.select);
+      if (!match) continue;
+      let value = null;
+      for (const attr of field.attr) {
+        value = match.getAttribute(attr);
+        if (value !== null) break;
+      }
+      raw[name] = value !== null ? value.trim() : match.textContent.split(/\\s+/).join(' ').trim();
+    }
+    records.push(raw);
+    if (Object.entries(rules.required).every(([name, min]) => (raw[name] || '').length >= min)) valid++;
+  }
+  return records;
+}
+"""
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Streaming transforms from provider payloads to data/*.json, and schema checks.
+
+Each extraction format in scripts/sources.json has a parser factory that
+returns (feed, finish): feed(chunk) takes raw response bytes as they arrive
+and finish() returns the projected value. RSS is parsed incrementally with
+XMLPullParser, clearing each <item> once its fields are read, and HTML
+goes through the incremental RuleScanner, so neither holds a document tree.
+JSON payloads are buffered and parsed once at the end (the standard library
+has no incremental JSON parser), then only the configured fields are kept.
+
+Formats:
+  html-rules   listings via extraction rules (rules: name of a rules file)
+  rss          one object per <item>, fields mapping output name -> child tag
+  json-object  fields projected from the document
+  json-list    one object per element of the list at path
+  json-map     one object per key of entries, fields read from document[key]
+
+A field is a dotted path ("current_condition.0.temp_F"), or an object with
+path and optional type (int, float, str), template ("…/{user.username}")
+or const.
+
+validate(data, schema) checks an assembled file before it is written:
+  "str" / "int" / "number" / "bool"   a value of that type ("str" non-empty)
+  "str?" ...                          the same, or null ("str?" may be empty)
+  {"field": schema, ...}              an object with (at least) these fields
+  {"*": schema}                       a non-empty object whose values all match
+  [schema]                            a non-empty list whose items all match
+
+Saved payloads can be ingested offline, one file per request of the source:
+  python3 scripts/feed_transforms.py weather weather_raw.json -o data/weather.json
+"""
+
+import argparse
+import codecs
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+from cloudflare import HEAD_BYTES, is_challenge_page
+from extraction_rules import RuleScanner, load_rules
+from http_cache import write_atomic
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sources.json')
+CHUNK_SIZE = 16 * 1024
+TEMPLATE_FIELD = re.compile(r'\{([^{}]+)\}')
+TYPES = {'int': int, 'float': float, 'str': str}
+
+
+class TransformError(Exception):
+    """A payload could not be parsed into its configured shape."""
+
+
+def lookup(document, path):
+    """Follow a dotted path through dicts and lists; None when anything is missing."""
+    value = document
+    for key in path.split('.') if path else ():
+        if isinstance(value, list):
+            try:
+                value = value[int(key)]
+            except (ValueError, IndexError):
+                return None
+        elif isinstance(value, dict):
+            value = value.get(key)
+        else:
+            return None
+    return value
+
+
+def project(document, fields):
+    """Build {name: value} from a field spec mapping."""
+    record = {}
+    for name, spec in fields.items():
+        if isinstance(spec, str):
+            spec = {"path": spec}
+        if 'const' in spec:
+            value = spec['const']
+        elif 'template' in spec:
+            value = TEMPLATE_FIELD.sub(lambda m: str(lookup(document, m.group(1)) or ''), spec['template'])
+        else:
+            value = lookup(document, spec['path'])
+        if value is not None and 'type' in spec:
+            try:
+                value = TYPES[spec['type']](value)
+            except (TypeError, ValueError):
+                value = None
+        record[name] = value
+    return record
+
+
+def html_rules_parser(part):
+    parser = RuleScanner(load_rules(part['rules']))
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    state = {'head': ''}
+
+    def feed(chunk):
+        if parser.done:
+            return
+        text = decoder.decode(chunk)
+        # The challenge markers sit in the first few KB
+        if state['head'] is not None:
+            state['head'] += text
+            if is_challenge_page(state['head']):
+                raise TransformError("served a Cloudflare challenge")
+            if len(state['head']) >= HEAD_BYTES:
+                state['head'] = None
+        parser.feed(text)
+
+    def finish():
+        if not parser.done:
+            parser.feed(decoder.decode(b'', final=True))
+            parser.close()
+        return parser.get_listings()
+
+    return feed, finish
+
+
+def rss_parser(part):
+    parser = ET.XMLPullParser(events=('end',))
+    fields = part['fields']
+    limit = part.get('limit')
+    items = []
+
+    def collect():
+        for _, element in parser.read_events():
+            if element.tag != 'item':
+                continue
+            if limit is None or len(items) < limit:
+                items.append({name: ' '.join((element.findtext(tag) or '').split())
+                              for name, tag in fields.items()})
+            element.clear()
+
+    def feed(chunk):
+        try:
+            parser.feed(chunk)
+        except ET.ParseError as e:
+            raise TransformError(f"invalid RSS: {e}") from e
+        collect()
+
+    def finish():
+        try:
+            parser.close()
+        except ET.ParseError as e:
+            raise TransformError(f"invalid RSS: {e}") from e
+        collect()
+        return items
+
+    return feed, finish
+
+
+def json_parser(transform):
+    """Factory for JSON formats: buffer the payload, then project it with transform."""
+    def factory(part):
+        chunks = []
+
+        def finish():
+            try:
+                document = json.loads(b''.join(chunks))
+            except ValueError as e:
+                raise TransformError(f"invalid JSON: {e}") from e
+            return transform(document, part)
+
+        return chunks.append, finish
+    return factory
+
+
+def json_object(document, part):
+    value = lookup(document, part.get('path', ''))
+    if not isinstance(value, dict):
+        raise TransformError(f"expected an object at {part.get('path') or 'the top level'}")
+    return project(value, part['fields'])
+
+
+def json_list(document, part):
+    elements = lookup(document, part.get('path', ''))
+    if not isinstance(elements, list):
+        raise TransformError(f"expected a list at {part.get('path') or 'the top level'}")
+    return [project(element, part['fields']) for element in elements[:part.get('limit')]]
+
+
+def json_map(document, part):
+    records = {}
+    for key, entry in part['entries'].items():
+        if isinstance(document.get(key), dict):
+            record = dict(entry, **project(document[key], part['fields']))
+            records[record.get(part.get('key_field'), key)] = record
+    return records
+
+
+PARSERS = {
+    'html-rules': html_rules_parser,
+    'rss': rss_parser,
+    'json-object': json_parser(json_object),
+    'json-list': json_parser(json_list),
+    'json-map': json_parser(json_map),
+}
+
+
+def transform(part, chunks):
+    """Run a part's format over an iterable of byte chunks."""
+    feed, finish = PARSERS[part['format']](part)
+    for chunk in chunks:
+        feed(chunk)
+    return finish()
+
+
+def assemble(source, values, last_updated):
+    """Combine the values of a source's requests into its output document."""
+    data = {}
+    for part, value in zip(source['parts'], values):
+        if part.get('key'):
+            data[part['key']] = value
+        else:
+            data.update(value)
+    # After last_updated, where the existing files keep fields like "source"
+    data['last_updated'] = last_updated
+    data.update(source.get('constants', {}))
+    return data
+
+
+def check_type(value, expected):
+    if expected == 'str':
+        return isinstance(value, str) and value.strip() != ''
+    if expected == 'int':
+        return isinstance(value, int) and not isinstance(value, bool)
+    if expected == 'number':
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected == 'bool':
+        return isinstance(value, bool)
+    raise ValueError(f"unknown schema type {expected!r}")
+
+
+def validate(data, schema, path='$'):
+    """Return a list of 'path: problem' strings; empty when data matches schema."""
+    if isinstance(schema, str):
+        if schema.endswith('?'):
+            if data is None or (schema == 'str?' and isinstance(data, str)):
+                return []
+            schema = schema[:-1]
+        if check_type(data, schema):
+            return []
+        return [f"{path}: expected {schema}, got {json.dumps(data)[:60]}"]
+
+    if isinstance(schema, list):
+        if not isinstance(data, list) or not data:
+            return [f"{path}: expected a non-empty list"]
+        errors = []
+        for index, item in enumerate(data):
+            errors.extend(validate(item, schema[0], f"{path}[{index}]"))
+        return errors
+
+    if not isinstance(data, dict):
+        return [f"{path}: expected an object"]
+    if '*' in schema:
+        if not data:
+            return [f"{path}: expected a non-empty object"]
+        errors = []
+        for key, value in data.items():
+            errors.extend(validate(value, schema['*'], f"{path}.{key}"))
+        return errors
+    errors = []
+    for field, field_schema in schema.items():
+        if field not in data:
+            errors.append(f"{path}.{field}: missing")
+        else:
+            errors.extend(validate(data[field], field_schema, f"{path}.{field}"))
+    return errors
+
+
+def read_chunks(path):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transform saved provider payloads into a data file')
+    parser.add_argument('source', help='source name in the sources file')
+    parser.add_argument('payloads', nargs='+', help='one saved payload per request of the source')
+    parser.add_argument('-o', '--output', help='write here atomically (default: print)')
+    parser.add_argument('--config', default=CONFIG_PATH, help='sources file')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        source = json.load(f)['sources'][args.source]
+    if len(args.payloads) != len(source['parts']):
+        parser.error(f"{args.source} takes {len(source['parts'])} payload(s)")
+
+    try:
+        values = [transform(part, read_chunks(path)) for part, path in zip(source['parts'], args.payloads)]
+    except TransformError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    data = assemble(source, values, datetime.now(timezone.utc).isoformat())
+    errors = validate(data, source.get('schema', {}))
+    for error in errors:
+        print(f"Schema: {error}", file=sys.stderr)
+    if errors:
+        return 1
+
+    text = json.dumps(data, indent=2) + '\n'
+    if args.output:
+        write_atomic(args.output, text)
+        print(f"✓ Wrote {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Adaptive, hedged selection between fetch strategies.
+
+Per-strategy success rates and latencies are remembered across runs in
+.cache/rhizome/strategy-stats.json. Each run starts with the strategy with
+the lowest expected cost (latency / success rate). If it has not finished
+within its usual latency, the next strategy is started alongside it
+(hedging). The first success wins and the others are abandoned. With
+race=True every strategy starts at once.
+
+Strategies are plain callables returning a truthy result on success. They
+run in daemon threads because neither requests nor Playwright's sync API
+can be cancelled mid-call; an abandoned strategy is simply not waited for.
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from http_cache import DEFAULT_CACHE_DIR, write_atomic
+
+STATS_PATH = os.path.join(DEFAULT_CACHE_DIR, 'strategy-stats.json')
+# Weight of the newest latency sample in the moving average
+EWMA_WEIGHT = 0.3
+
+
+class StrategyStats:
+    """Persistent per-strategy attempts, successes and latency averages."""
+
+    def __init__(self, path=STATS_PATH, default_costs=None):
+        self.path = path
+        self.default_costs = default_costs or {}
+        try:
+            with open(path) as f:
+                self.stats = json.load(f)
+        except (OSError, ValueError):
+            self.stats = {}
+
+    def record(self, name, ok, seconds):
+        entry = self.stats.setdefault(name, {"attempts": 0, "successes": 0, "latency": None})
+        entry['attempts'] += 1
+        if ok:
+            entry['successes'] += 1
+            # Only successes say how long a win takes; failures are often timeouts
+            previous = entry['latency']
+            entry['latency'] = seconds if previous is None else (
+                EWMA_WEIGHT * seconds + (1 - EWMA_WEIGHT) * previous
+            )
+
+    def latency(self, name):
+        entry = self.stats.get(name) or {}
+        if entry.get('latency') is not None:
+            return entry['latency']
+        return self.default_costs.get(name, 10.0)
+
+    def success_rate(self, name):
+        # Laplace smoothing: untried strategies start at 50%, not 0% or 100%
+        entry = self.stats.get(name) or {}
+        return (entry.get('successes', 0) + 1) / (entry.get('attempts', 0) + 2)
+
+    def expected_cost(self, name):
+        return self.latency(name) / self.success_rate(name)
+
+    def order(self, names):
+        return sorted(names, key=self.expected_cost)
+
+    def save(self):
+        write_atomic(self.path, json.dumps(self.stats, indent=2))
+
+
+def run_strategies(strategies, stats, race=False, hedge_factor=1.5, min_hedge=2.0):
+    """Run strategies cheapest-first with hedging; return (winner name, result).
+
+    Returns (None, None) if every strategy fails.
+    """
+    pending = stats.order(list(strategies))
+    results = queue.Queue()
+
+    def worker(name):
+        started = time.perf_counter()
+        try:
+            result = strategies[name]()
+        except Exception as e:
+            print(f"Strategy {name} error: {e}", file=sys.stderr)
+            result = None
+        results.put((name, result, time.perf_counter() - started))
+
+    def launch():
+        name = pending.pop(0)
+        print(f"Starting fetch strategy: {name}", file=sys.stderr)
+        threading.Thread(target=worker, args=(name,), daemon=True, name=f"fetch-{name}").start()
+        return name
+
+    newest = launch()
+    running = 1
+    while race and pending:
+        newest = launch()
+        running += 1
+
+    try:
+        while running:
+            timeout = max(min_hedge, hedge_factor * stats.latency(newest)) if pending else None
+            try:
+                name, result, seconds = results.get(timeout=timeout)
+            except queue.Empty:
+                print(f"{newest} still running after {timeout:.1f}s, hedging with {pending[0]}", file=sys.stderr)
+                newest = launch()
+                running += 1
+                continue
+
+            running -= 1
+            stats.record(name, bool(result), seconds)
+            if result:
+                print(f"✓ {name} won in {seconds:.2f}s", file=sys.stderr)
+                return name, result
+            print(f"{name} failed after {seconds:.2f}s", file=sys.stderr)
+            if pending:
+                newest = launch()
+                running += 1
+        return None, None
+    finally:
+        stats.save()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP validator cache shared by the Rhizome fetchers.
+Stores ETag/Last-Modified plus the last body so unchanged pages can be
+revalidated with a conditional request instead of re-downloaded.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from datetime import datetime, timezone
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'RHIZOME_CACHE_DIR',
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache', 'rhizome'))
+)
+
+# Returned by a fetcher when the server answered 304 Not Modified
+NOT_MODIFIED = object()
+
+# The mode open() would give a new file; mkstemp always uses 0600.
+# Read once here, as os.umask() can only be read by setting it
+_umask = os.umask(0)
+os.umask(_umask)
+NEW_FILE_MODE = 0o666 & ~_umask
+
+
+def write_atomic(path, data, mode='w'):
+    """Write to a temp file next to path, then rename it into place.
+
+    The file keeps the mode of the one it replaces, or gets NEW_FILE_MODE.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    try:
+        file_mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        file_mode = NEW_FILE_MODE
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.chmod(tmp_path, file_mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ValidatorCache:
+    """Per-URL store of HTTP validators, the last body and its parsed result.
+
+    Each scraper parses differently, so entries are namespaced per caller
+    to keep one script's cached result from being replayed by another.
+    """
+
+    def __init__(self, namespace='default', cache_dir=None):
+        self.namespace = namespace
+        self.cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+
+    def _key(self, url):
+        return hashlib.sha256(f"{self.namespace}:{url}".encode('utf-8')).hexdigest()[:32]
+
+    def _entry_path(self, url):
+        return os.path.join(self.cache_dir, f"{self._key(url)}.json")
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, f"{self._key(url)}.html.gz")
+
+    def load(self, url):
+        """Return the cached entry for url, or None."""
+        try:
+            with open(self._entry_path(url)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def has_validators(self, url):
+        entry = self.load(url)
+        return bool(entry and (entry.get('etag') or entry.get('last_modified')))
+
+    def conditional_headers(self, url):
+        """Build If-None-Match / If-Modified-Since headers for url."""
+        entry = self.load(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response_headers, body):
+        """Remember the validators and body of a 200 response."""
+        # Header lookups are case-insensitive on requests/urllib objects but
+        # not on plain dicts, so normalise first
+        headers = {k.lower(): v for k, v in dict(response_headers).items()}
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        if not etag and not last_modified:
+            return
+
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        write_atomic(self._body_path(url), gzip.compress(body), mode='wb')
+
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": datetime.now(timezone.utc).isoformat(),
+            "result": None,
+        }
+        write_atomic(self._entry_path(url), json.dumps(entry, indent=2))
+
+    def store_result(self, url, result):
+        """Attach the parsed result of the cached body so a 304 can reuse it."""
+        entry = self.load(url)
+        if entry is None:
+            return
+        entry['result'] = result
+        write_atomic(self._entry_path(url), json.dumps(entry, indent=2))
+
+    def cached_body(self, url):
+        try:
+            with gzip.open(self._body_path(url), 'rb') as f:
+                return f.read().decode('utf-8')
+        except OSError:
+            return None
+
+    def cached_result(self, url):
+        entry = self.load(url)
+        return entry.get('result') if entry else None
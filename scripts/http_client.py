@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Resilient pooled HTTP client shared by the Python scrapers.
+
+Built on http.client so the standard-library scraper can use it too:
+
+- keep-alive connections pooled per host (thread-safe)
+- transparent gzip/deflate decoding, plus brotli when the brotli module is
+  installed (br is only advertised when it can actually be decoded)
+- separate connect and read timeouts
+- exponential backoff with full jitter on connection errors and 429/5xx,
+  honouring Retry-After, under a process-wide retry budget so a failing
+  host can't multiply load; Cloudflare challenges are never retried
+- redirects followed, responses streamed with read(n)
+- recorded to or replayed from the active cassette (see cassette.py)
+
+Usage:
+  with default_client().get(url, headers=headers) as response:
+      head = response.read(8192)
+      rest = response.read()
+"""
+
+import http.client
+import random
+import ssl
+import sys
+import threading
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+from cassette import CassetteMiss, ReplayResponse
+from cassette import active as active_cassette
+from cloudflare import is_challenge_response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+CHUNK_SIZE = 16 * 1024
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli else 'gzip, deflate'
+
+# A reused keep-alive connection the server already closed fails like this
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class FetchError(Exception):
+    """Raised when a request still fails after retries."""
+
+
+class RetryBudget:
+    """Allow at most minimum + ratio * requests retries across the client's lifetime."""
+
+    def __init__(self, ratio=0.2, minimum=3):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.requests = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def record_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def try_spend(self):
+        with self.lock:
+            if self.retries >= self.minimum + self.ratio * self.requests:
+                return False
+            self.retries += 1
+            return True
+
+
+def make_decoder(content_encoding):
+    """Return a function decoding one chunk (b'' flushes), or None for identity."""
+    encoding = (content_encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return lambda chunk: d.decompress(chunk) if chunk else d.flush()
+    if encoding == 'deflate':
+        state = {}
+
+        def inflate(chunk):
+            if 'd' not in state:
+                # Servers disagree on zlib-wrapped vs raw deflate; sniff the header
+                raw = not chunk or (chunk[0] & 0x0F) != 8
+                state['d'] = zlib.decompressobj(-zlib.MAX_WBITS if raw else zlib.MAX_WBITS)
+            return state['d'].decompress(chunk) if chunk else state['d'].flush()
+        return inflate
+    if encoding == 'br':
+        if brotli is None:
+            raise FetchError("Server sent brotli but the brotli module is not installed")
+        d = brotli.Decompressor()
+        return lambda chunk: d.process(chunk) if chunk else b''
+    return None
+
+
+class Response:
+    """A streamed, decoded response that returns its connection to the pool on close."""
+
+    def __init__(self, client, key, conn, raw, url):
+        self.client = client
+        self.key = key
+        self.conn = conn
+        self.raw = raw
+        self.url = url
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self.charset = raw.headers.get_content_charset()
+        self._decode = make_decoder(raw.headers.get('Content-Encoding'))
+        self._buffer = b''
+        self._eof = False
+
+    def _fill(self, size):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self.raw.read(CHUNK_SIZE)
+            if not chunk:
+                self._eof = True
+                if self._decode:
+                    self._buffer += self._decode(b'')
+                break
+            self._buffer += self._decode(chunk) if self._decode else chunk
+
+    def read(self, size=-1):
+        """Read up to size decoded bytes, or everything left when size is negative."""
+        if size is None:
+            size = -1
+        self._fill(size)
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def text(self):
+        return self.read().decode(self.charset or 'utf-8', errors='replace')
+
+    def close(self):
+        if self.conn is None:
+            return
+        # Only a fully drained response leaves the connection reusable
+        if self._eof and not self.raw.will_close:
+            self.client._release(self.key, self.conn)
+        else:
+            self.conn.close()
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HttpClient:
+    """Pooled keep-alive HTTP client with timeouts, retries and decoding."""
+
+    def __init__(self, connect_timeout=5.0, read_timeout=30.0, max_retries=3,
+                 backoff_base=0.5, backoff_cap=8.0, pool_size=8, budget=None, max_redirects=5):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.pool_size = pool_size
+        self.budget = budget or RetryBudget()
+        self.max_redirects = max_redirects
+        self.pool = {}
+        self.lock = threading.Lock()
+        self._ssl_context = None
+
+    def _connect(self, key, connect_timeout):
+        scheme, host, port = key
+        if scheme == 'https':
+            if self._ssl_context is None:
+                # Loading the CA bundle takes ~0.1s; only pay for it when needed
+                self._ssl_context = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(host, port, timeout=connect_timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=connect_timeout)
+        conn.connect()
+        return conn
+
+    def _acquire(self, key):
+        with self.lock:
+            idle = self.pool.get(key)
+            if idle:
+                return idle.pop(), True
+        return None, False
+
+    def _release(self, key, conn):
+        with self.lock:
+            idle = self.pool.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            for idle in self.pool.values():
+                for conn in idle:
+                    conn.close()
+            self.pool.clear()
+
+    def _send(self, method, url, headers, connect_timeout, read_timeout):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        request_headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        request_headers.update(headers or {})
+
+        conn, reused = self._acquire(key)
+        while True:
+            if conn is None:
+                conn = self._connect(key, connect_timeout)
+            conn.sock.settimeout(read_timeout)
+            try:
+                conn.request(method, path, headers=request_headers)
+                raw = conn.getresponse()
+                return Response(self, key, conn, raw, url)
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # The pooled connection had gone stale; that's not a real failure
+                conn, reused = None, False
+            except BaseException:
+                conn.close()
+                raise
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(self.backoff_cap, float(retry_after)))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def request(self, method, url, headers=None, connect_timeout=None, read_timeout=None):
+        """Send a request, retrying and following redirects; returns a streamed Response.
+
+        Any final status is returned as-is, including 304 and 4xx; only
+        failures that outlast the retries raise FetchError.
+        """
+        cassette = active_cassette()
+        if cassette and cassette.replaying:
+            try:
+                return cassette.replay(method, url)
+            except CassetteMiss as e:
+                raise FetchError(str(e)) from e
+
+        connect_timeout = connect_timeout or self.connect_timeout
+        read_timeout = read_timeout or self.read_timeout
+        self.budget.record_request()
+        started = time.perf_counter()
+        requested_url = url
+
+        attempt = 0
+        redirects = 0
+        while True:
+            try:
+                response = self._send(method, url, headers, connect_timeout, read_timeout)
+            except (OSError, http.client.HTTPException) as e:
+                if attempt >= self.max_retries or not self.budget.try_spend():
+                    raise FetchError(f"{method} {url} failed: {e}") from e
+                print(f"Retrying {url} after error: {e}", file=sys.stderr)
+                self._backoff(attempt)
+                attempt += 1
+                continue
+
+            if response.status in REDIRECT_STATUSES and response.headers.get('Location'):
+                response.read()
+                response.close()
+                redirects += 1
+                if redirects > self.max_redirects:
+                    raise FetchError(f"{method} {url} exceeded {self.max_redirects} redirects")
+                url = urljoin(url, response.headers['Location'])
+                if response.status == 303:
+                    method = 'GET'
+                continue
+
+            # Retrying a Cloudflare challenge only gets challenged again
+            retryable = (response.status in RETRY_STATUSES
+                         and not is_challenge_response(response.status, response.headers))
+            if retryable and attempt < self.max_retries and self.budget.try_spend():
+                retry_after = response.headers.get('Retry-After')
+                # Drain short error bodies so the connection can be reused
+                if int(response.headers.get('Content-Length') or CHUNK_SIZE + 1) <= CHUNK_SIZE:
+                    response.read()
+                response.close()
+                print(f"Retrying {url} after HTTP {response.status}", file=sys.stderr)
+                self._backoff(attempt, retry_after)
+                attempt += 1
+                continue
+
+            if cassette:
+                body = response.read()
+                response.close()
+                entry = cassette.record(method, requested_url, response.status, response.reason,
+                                        response.headers.items(), body, time.perf_counter() - started, 'http')
+                return ReplayResponse(entry, body)
+            return response
+
+    def get(self, url, headers=None, **kwargs):
+        return self.request('GET', url, headers=headers, **kwargs)
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """The process-wide client, so every scraper shares one pool and retry budget."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
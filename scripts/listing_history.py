@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Append-only history of Rhizome listing observations.
+
+Every observation is one compact JSON line in rhizome-history.jsonl. The
+full listing is only written when it is new or its content changed; repeat
+sightings are just {"t", "id", "h"}. rhizome-history.index.json keeps byte
+offsets so queries seek straight to the lines they need:
+
+- days: the first offset of each UTC day (the log is in time order, so a
+  date range is one contiguous byte range)
+- ids: per listing the first/last sighting, content hash, sighting count
+  and the offsets of its full records
+
+Queries therefore cost time proportional to the answer, not the history.
+
+Usage:
+  python3 scripts/listing_history.py first-seen <listing-id>
+  python3 scripts/listing_history.py show <listing-id>
+  python3 scripts/listing_history.py between 2026-03-01 2026-03-31
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import sys
+
+from http_cache import write_atomic
+from merge_listings import CONTENT_FIELDS, is_placeholder_date, listing_id
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'history')
+HISTORY_FIELDS = CONTENT_FIELDS + ('date',)
+
+
+def history_record(listing):
+    """The fields kept for a listing, leaving out a date that only records the parse time."""
+    return {field: listing.get(field, '') for field in HISTORY_FIELDS
+            if not (field == 'date' and is_placeholder_date(listing.get(field)))}
+
+
+def content_hash(listing):
+    record = history_record(listing)
+    content = json.dumps([record.get(field, '') for field in HISTORY_FIELDS], separators=(',', ':'))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:10]
+
+
+class ListingHistory:
+    """The history log plus its offset index, kept in one directory."""
+
+    def __init__(self, directory=None):
+        self.directory = os.path.normpath(directory or DEFAULT_HISTORY_DIR)
+        self.log_path = os.path.join(self.directory, 'rhizome-history.jsonl')
+        self.index_path = os.path.join(self.directory, 'rhizome-history.index.json')
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {"version": 1, "log_size": 0, "days": [], "ids": {}}
+
+        # A run that died between appending and saving the index leaves an
+        # unindexed tail; index it now rather than trusting a stale index
+        log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if log_size < index['log_size']:
+            index = {"version": 1, "log_size": 0, "days": [], "ids": {}}
+        if log_size > index['log_size']:
+            with open(self.log_path, 'rb') as f:
+                f.seek(index['log_size'])
+                offset = index['log_size']
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # A torn last line isn't counted, so append() truncates it
+                        break
+                    self._index_line(index, offset, json.loads(line))
+                    offset += len(line)
+            index['log_size'] = offset
+        return index
+
+    def _index_line(self, index, offset, entry):
+        day = entry['t'][:10]
+        if not index['days'] or index['days'][-1][0] < day:
+            index['days'].append([day, offset])
+
+        info = index['ids'].setdefault(entry['id'], {"first": offset, "records": [], "sightings": 0})
+        info['last'] = offset
+        info['hash'] = entry['h']
+        info['sightings'] += 1
+        if 'l' in entry:
+            info['records'].append(offset)
+
+    def append(self, listings, observed_at):
+        """Record one sighting of each listing at observed_at (an ISO timestamp)."""
+        os.makedirs(self.directory, exist_ok=True)
+        lines = []
+        pending = {}
+        for listing in listings:
+            key = listing.get('id') or listing_id(listing)
+            entry = {"t": observed_at, "id": key, "h": content_hash(listing)}
+            known = pending.get(key) or self.index['ids'].get(key, {}).get('hash')
+            if known != entry['h']:
+                entry['l'] = history_record(listing)
+            pending[key] = entry['h']
+            lines.append(entry)
+
+        offset = self.index['log_size']
+        with open(self.log_path, 'ab') as f:
+            # Drop any torn line left by an interrupted append
+            if f.tell() != offset:
+                f.truncate(offset)
+            for entry in lines:
+                data = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+                f.write(data)
+                self._index_line(self.index, offset, entry)
+                offset += len(data)
+        self.index['log_size'] = offset
+
+        write_atomic(self.index_path, json.dumps(self.index, separators=(',', ':')))
+
+    def _read_at(self, f, offset):
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def _record_before(self, f, key, offset):
+        """The full listing for key as of the line at offset."""
+        records = self.index['ids'][key]['records']
+        i = bisect.bisect_right(records, offset) - 1
+        return self._read_at(f, records[max(i, 0)])['l']
+
+    def first_seen(self, key):
+        """Timestamp of the first sighting of a listing, or None."""
+        info = self.index['ids'].get(key)
+        if not info:
+            return None
+        with open(self.log_path, 'rb') as f:
+            return self._read_at(f, info['first'])['t']
+
+    def versions(self, key):
+        """Every distinct version of a listing as (first seen at, listing)."""
+        info = self.index['ids'].get(key)
+        if not info:
+            return []
+        with open(self.log_path, 'rb') as f:
+            return [(entry['t'], entry['l']) for entry in (self._read_at(f, o) for o in info['records'])]
+
+    def between(self, start_day, end_day):
+        """Listings seen between two YYYY-MM-DD days (inclusive), with first/last sighting in range."""
+        days = [day for day, _ in self.index['days']]
+        start = bisect.bisect_left(days, start_day)
+        if start == len(days):
+            return []
+        end = bisect.bisect_right(days, end_day)
+        start_offset = self.index['days'][start][1]
+        end_offset = self.index['days'][end][1] if end < len(days) else self.index['log_size']
+
+        seen = {}
+        with open(self.log_path, 'rb') as f:
+            f.seek(start_offset)
+            chunk = f.read(end_offset - start_offset)
+            offset = start_offset
+            for line in chunk.splitlines(keepends=True):
+                entry = json.loads(line)
+                if entry['id'] in seen:
+                    seen[entry['id']]['last_seen'] = entry['t']
+                else:
+                    seen[entry['id']] = {"id": entry['id'], "first_seen": entry['t'],
+                                         "last_seen": entry['t'], "offset": offset}
+                offset += len(line)
+
+            results = []
+            for key, item in seen.items():
+                listing = self._record_before(f, key, item.pop('offset'))
+                results.append(dict(listing, **item))
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the Rhizome listing history')
+    parser.add_argument('--dir', default=DEFAULT_HISTORY_DIR, help='history directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    first = commands.add_parser('first-seen', help='when a listing first appeared')
+    first.add_argument('listing_id')
+    show = commands.add_parser('show', help='every version of a listing')
+    show.add_argument('listing_id')
+    between = commands.add_parser('between', help='listings seen between two days')
+    between.add_argument('start', help='YYYY-MM-DD')
+    between.add_argument('end', help='YYYY-MM-DD')
+    args = parser.parse_args(argv)
+
+    history = ListingHistory(args.dir)
+    if args.command == 'first-seen':
+        result = history.first_seen(args.listing_id)
+    elif args.command == 'show':
+        result = [{"seen": seen, **listing} for seen, listing in history.versions(args.listing_id)]
+    else:
+        result = history.between(args.start, args.end)
+
+    if not result:
+        print("Not found", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Merge freshly fetched Rhizome listings into the previous data/rhizome.json.
+
+Listings are keyed by a stable identity (their detail URL, or their title
+when they only link to the index), keep the first_seen timestamp and date
+of their first sighting, and the file is rewritten only when a listing
+was added, removed or changed. The change summary is machine-readable so
+the workflow can skip commits and website rebuilds on quiet runs.
+"""
+
+import hashlib
+import json
+import os
+
+from extraction_rules import ParseTime
+
+INDEX_URL = 'https://rhizome.org/community/'
+CONTENT_FIELDS = ('title', 'description', 'url', 'type')
+
+
+def listing_id(listing):
+    """Stable identity: the detail URL, else the whitespace-normalized title."""
+    url = (listing.get('url') or '').rstrip('/')
+    if url and url != INDEX_URL.rstrip('/'):
+        key = f"url:{url}"
+    else:
+        key = f"title:{' '.join((listing.get('title') or '').lower().split())}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def is_placeholder_date(value):
+    """True for dates the parser stamped from a $now default rather than read from the page."""
+    return isinstance(value, ParseTime)
+
+
+def load_previous(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def merge_listings(previous_listings, current_listings, run_started):
+    """Return (merged listings, change summary) for one fetch.
+
+    run_started is a timezone-aware datetime. Dates the parser filled in
+    from a $now default never count as a change.
+    """
+    now = run_started.isoformat()
+    previous = {}
+    for listing in previous_listings:
+        previous[listing.get('id') or listing_id(listing)] = listing
+
+    merged = []
+    added, updated = [], []
+    seen = set()
+    for listing in current_listings:
+        key = listing_id(listing)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        record = {"id": key}
+        record.update({field: listing.get(field, '') for field in CONTENT_FIELDS})
+        old = previous.get(key)
+        fresh_date = listing.get('date', '')
+
+        if old is None:
+            record['date'] = now if is_placeholder_date(fresh_date) else fresh_date
+            record['first_seen'] = now
+            added.append(key)
+        else:
+            record['date'] = old.get('date', '') if is_placeholder_date(fresh_date) else fresh_date
+            record['first_seen'] = old.get('first_seen', now)
+            if any(record[field] != old.get(field, '') for field in CONTENT_FIELDS + ('date',)):
+                updated.append(key)
+        record['last_seen'] = now
+        merged.append(record)
+
+    removed = [key for key in previous if key not in seen]
+    order_changed = [l.get('id') for l in previous_listings] != [r['id'] for r in merged]
+    changes = {
+        "changed": bool(added or removed or updated or order_changed),
+        "added": added,
+        "removed": removed,
+        "updated": updated,
+        "unchanged": len(merged) - len(added) - len(updated),
+    }
+    return merged, changes
+
+
+def unchanged_summary(listings):
+    """Change summary for a run that leaves the data file as it is."""
+    return {"changed": False, "added": [], "removed": [], "updated": [], "unchanged": len(listings)}
+
+
+def write_changes(changes, path=None):
+    """Write the summary to path and expose `changed` as a GitHub Actions step output."""
+    if path:
+        with open(path, 'w') as f:
+            json.dump(changes, f, indent=2)
+
+    github_output = os.environ.get('GITHUB_OUTPUT')
+    if github_output:
+        with open(github_output, 'a') as f:
+            f.write(f"changed={'true' if changes['changed'] else 'false'}\n")
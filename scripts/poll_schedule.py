@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Adaptive polling interval for watch mode.
+
+The observed change rate (changes per second) is a moving average over
+polls: a poll that saw a change adds 1 / (seconds since the last poll),
+a quiet poll adds 0. The next interval aims for target_changes expected
+changes per poll, so it shrinks while listings churn and grows by about
+1 / (1 - EWMA_WEIGHT) with every quiet poll, always within
+[min_interval, max_interval]. Each interval gets +/- jitter so a fleet of
+watchers (or a restarted one) doesn't poll in lockstep.
+
+The learned rate is kept in .cache/rhizome/poll-state.json so a restart
+doesn't have to relearn it.
+"""
+
+import json
+import os
+import random
+import time
+
+from http_cache import DEFAULT_CACHE_DIR, write_atomic
+
+STATE_PATH = os.path.join(DEFAULT_CACHE_DIR, 'poll-state.json')
+# Weight of the newest poll in the change-rate average
+EWMA_WEIGHT = 0.3
+
+
+class AdaptivePoll:
+    """Next-poll delays from the change rate seen so far."""
+
+    def __init__(self, min_interval=600, max_interval=6 * 3600, target_changes=0.5, jitter=0.2,
+                 path=STATE_PATH):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_changes = target_changes
+        self.jitter = jitter
+        self.path = path
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            # Start in the middle (geometrically) of the allowed range
+            state = {"rate": target_changes / (min_interval * max_interval) ** 0.5, "last_poll": None}
+        self.rate = state['rate']
+        self.last_poll = state['last_poll']
+
+    def interval(self):
+        """The un-jittered interval for the current rate."""
+        if self.rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target_changes / self.rate))
+
+    def record(self, changed, now=None):
+        """Fold one poll into the rate and return seconds to wait before the next."""
+        now = time.time() if now is None else now
+        if self.last_poll is not None and now > self.last_poll:
+            sample = (1.0 if changed else 0.0) / (now - self.last_poll)
+            self.rate = EWMA_WEIGHT * sample + (1 - EWMA_WEIGHT) * self.rate
+        self.last_poll = now
+        write_atomic(self.path, json.dumps({"rate": self.rate, "last_poll": self.last_poll}, indent=2))
+
+        return self.interval() * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Columnar price history per crypto symbol, with rolling statistics.
+
+data/crypto-prices.json only holds the latest snapshot, so each run's coins
+are appended here as one row per symbol: data/history/crypto/<SYMBOL>/
+holds one little-endian binary file per column (time.i64, price.f64,
+change_24h.f64, market_cap.f64, volume_24h.f64), 40 bytes a tick. Appends
+only add bytes to the end of each file, a row whose time isn't newer than
+the last one is skipped, and columns left uneven by an interrupted append
+are truncated back to the shortest on the next one. Missing values are NaN.
+
+Reads use the array module and seek straight to a row range, and a time
+range is found by binary search on time.i64, so a query never loads the
+whole history (or any JSON). PriceSeries.to_numpy() wraps the same buffers
+when numpy is installed.
+
+Rolling statistics are single passes over a column: moving average and
+standard deviation from running sums, min/max from monotonic deques, and
+volatility as the standard deviation of log returns. downsample() buckets
+ticks into OHLC rows for charts.
+
+Usage:
+  python3 scripts/price_history.py append [data/crypto-prices.json]
+  python3 scripts/price_history.py stats BTC --window 7 [--last 30]
+  python3 scripts/price_history.py chart BTC --interval 1w   # or --points 200
+  python3 scripts/price_history.py info
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                            '..', 'data', 'history', 'crypto'))
+FIELDS = ('price', 'change_24h', 'market_cap', 'volume_24h')
+COLUMNS = {'time': 'q', **{field: 'd' for field in FIELDS}}
+ITEM_SIZE = 8
+SWAP = sys.byteorder != 'little'
+NAN = float('nan')
+INTERVAL_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def column_file(name):
+    return f"{name}.{'i' if COLUMNS[name] == 'q' else 'f'}64"
+
+
+class PriceSeries:
+    """The columns of one symbol's history."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, column_file(name))
+
+    def _sizes(self):
+        sizes = {}
+        for name in COLUMNS:
+            try:
+                sizes[name] = os.path.getsize(self._path(name))
+            except OSError:
+                sizes[name] = 0
+        return sizes
+
+    def __len__(self):
+        return min(self._sizes().values()) // ITEM_SIZE
+
+    def read(self, name, start=0, stop=None):
+        """Rows start:stop of one column as an array (negative indices count from the end)."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        values = array(COLUMNS[name])
+        if stop <= start:
+            return values
+        with open(self._path(name), 'rb') as f:
+            f.seek(start * ITEM_SIZE)
+            values.frombytes(f.read((stop - start) * ITEM_SIZE))
+        if SWAP:
+            values.byteswap()
+        return values
+
+    def columns(self, start=0, stop=None):
+        return {name: self.read(name, start, stop) for name in COLUMNS}
+
+    def to_numpy(self, start=0, stop=None):
+        """Rows start:stop of every column as numpy arrays (requires numpy)."""
+        if numpy is None:
+            raise RuntimeError("numpy is not installed")
+        return {name: numpy.frombuffer(values, dtype=values.typecode)
+                for name, values in self.columns(start, stop).items()}
+
+    def find(self, timestamp):
+        """Index of the first row at or after timestamp, by binary search on disk."""
+        lo, hi = 0, len(self)
+        if not hi:
+            return 0
+        with open(self._path('time'), 'rb') as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(mid * ITEM_SIZE)
+                if struct.unpack('<q', f.read(ITEM_SIZE))[0] < timestamp:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return lo
+
+    def last_time(self):
+        times = self.read('time', -1)
+        return times[0] if times else None
+
+    def append(self, timestamp, values):
+        """Append one tick ({field: value}); returns False when it isn't newer than the last."""
+        sizes = self._sizes()
+        complete = min(sizes.values()) // ITEM_SIZE * ITEM_SIZE
+        for name, size in sizes.items():
+            if size != complete:
+                # An interrupted append left a partial row behind
+                with open(self._path(name), 'r+b') as f:
+                    f.truncate(complete)
+
+        last = self.last_time()
+        if last is not None and timestamp <= last:
+            return False
+
+        os.makedirs(self.directory, exist_ok=True)
+        row = {'time': array('q', [int(timestamp)])}
+        for field in FIELDS:
+            value = values.get(field)
+            row[field] = array('d', [NAN if value is None else float(value)])
+        for name, column in row.items():
+            if SWAP:
+                column.byteswap()
+            with open(self._path(name), 'ab') as f:
+                f.write(column.tobytes())
+        return True
+
+
+class PriceHistory:
+    """Per-symbol PriceSeries under one directory."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or DEFAULT_DIR
+
+    def series(self, symbol):
+        return PriceSeries(os.path.join(self.directory, symbol.upper()))
+
+    def symbols(self):
+        try:
+            return sorted(name for name in os.listdir(self.directory)
+                          if os.path.isdir(os.path.join(self.directory, name)))
+        except OSError:
+            return []
+
+    def append_snapshot(self, data, now=None):
+        """Append every coin of a crypto-prices.json document; returns the symbols that got a row."""
+        now = int(now or time.time())
+        appended = []
+        for symbol, coin in data.get('coins', {}).items():
+            timestamp = coin.get('last_updated') or now
+            if self.series(symbol).append(int(timestamp), coin):
+                appended.append(symbol)
+        return appended
+
+
+def rolling_mean(values, window):
+    """Mean of each trailing window; NaN until the window fills or while it holds a NaN."""
+    out = array('d', [NAN]) * len(values)
+    total = 0.0
+    missing = 0
+    for i, value in enumerate(values):
+        if value != value:
+            missing += 1
+        else:
+            total += value
+        if i >= window:
+            old = values[i - window]
+            if old != old:
+                missing -= 1
+            else:
+                total -= old
+        if i >= window - 1 and not missing:
+            out[i] = total / window
+    return out
+
+
+def rolling_std(values, window):
+    """Sample standard deviation of each trailing window (NaN as in rolling_mean)."""
+    out = array('d', [NAN]) * len(values)
+    # Sums of deviations from a reference value keep the squares small
+    reference = next((value for value in values if value == value), 0.0)
+    total = squares = 0.0
+    missing = 0
+    for i, value in enumerate(values):
+        if value != value:
+            missing += 1
+        else:
+            total += value - reference
+            squares += (value - reference) ** 2
+        if i >= window:
+            old = values[i - window]
+            if old != old:
+                missing -= 1
+            else:
+                total -= old - reference
+                squares -= (old - reference) ** 2
+        if i >= window - 1 and not missing and window > 1:
+            out[i] = math.sqrt(max(0.0, (squares - total * total / window) / (window - 1)))
+    return out
+
+
+def _rolling_extreme(values, window, better):
+    out = array('d', [NAN]) * len(values)
+    candidates = deque()  # indices whose values are still a possible extreme, best first
+    for i, value in enumerate(values):
+        if candidates and candidates[0] <= i - window:
+            candidates.popleft()
+        if value == value:
+            while candidates and not better(values[candidates[-1]], value):
+                candidates.pop()
+            candidates.append(i)
+        if i >= window - 1 and candidates:
+            out[i] = values[candidates[0]]
+    return out
+
+
+def rolling_min(values, window):
+    """Minimum of each trailing window, ignoring NaN."""
+    return _rolling_extreme(values, window, lambda kept, new: kept < new)
+
+
+def rolling_max(values, window):
+    """Maximum of each trailing window, ignoring NaN."""
+    return _rolling_extreme(values, window, lambda kept, new: kept > new)
+
+
+def log_returns(prices):
+    """log(p[i] / p[i-1]) per tick, NaN for the first tick and non-positive prices."""
+    out = array('d', [NAN]) * len(prices)
+    for i in range(1, len(prices)):
+        previous, current = prices[i - 1], prices[i]
+        if previous > 0 and current > 0:
+            out[i] = math.log(current / previous)
+    return out
+
+
+def volatility(prices, window):
+    """Standard deviation of the last window log returns at each tick."""
+    return rolling_std(log_returns(prices), window)
+
+
+def downsample(times, values, interval):
+    """OHLC buckets of interval seconds: columns time (bucket start), open, high, low, close, count."""
+    buckets = {'time': array('q'), 'open': array('d'), 'high': array('d'),
+               'low': array('d'), 'close': array('d'), 'count': array('q')}
+    current = None
+    for timestamp, value in zip(times, values):
+        if value != value:
+            continue
+        start = timestamp - timestamp % interval
+        if start != current:
+            current = start
+            for name, initial in (('time', start), ('open', value), ('high', value), ('low', value),
+                                  ('close', value), ('count', 0)):
+                buckets[name].append(initial)
+        buckets['high'][-1] = max(buckets['high'][-1], value)
+        buckets['low'][-1] = min(buckets['low'][-1], value)
+        buckets['close'][-1] = value
+        buckets['count'][-1] += 1
+    return buckets
+
+
+def parse_interval(text):
+    """'15m', '6h', '1d', '2w' or plain seconds."""
+    if text[-1:] in INTERVAL_UNITS:
+        return int(float(text[:-1]) * INTERVAL_UNITS[text[-1]])
+    return int(text)
+
+
+def jsonable(columns):
+    """Columns as lists, with NaN as null."""
+    return {name: [None if value != value else value for value in values] for name, values in columns.items()}
+
+
+def command_append(history, args):
+    with open(args.path) as f:
+        data = json.load(f)
+    appended = history.append_snapshot(data)
+    print(f"✓ Appended {', '.join(appended) or 'nothing new'} to {history.directory}", file=sys.stderr)
+
+
+def command_stats(history, args):
+    series = history.series(args.symbol)
+    # Only the rows the requested ticks' windows reach back over are read
+    start = max(0, len(series) - args.last - args.window)
+    times = series.read('time', start)
+    values = series.read(args.field, start)
+    prices = series.read('price', start) if args.field != 'price' else values
+    stats = {
+        "time": times,
+        args.field: values,
+        "mean": rolling_mean(values, args.window),
+        "min": rolling_min(values, args.window),
+        "max": rolling_max(values, args.window),
+        "volatility": volatility(prices, args.window),
+    }
+    skip = max(0, len(times) - args.last)
+    print(json.dumps({"symbol": args.symbol.upper(), "window": args.window,
+                      **jsonable({name: column[skip:] for name, column in stats.items()})}, indent=2))
+
+
+def command_chart(history, args):
+    series = history.series(args.symbol)
+    start = 0
+    if args.since:
+        start = series.find(int(datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc).timestamp()))
+    times = series.read('time', start)
+    if args.interval:
+        interval = parse_interval(args.interval)
+    else:
+        span_seconds = times[-1] - times[0] if times else 0
+        interval = max(1, math.ceil((span_seconds + 1) / args.points))
+    buckets = downsample(times, series.read(args.field, start), interval)
+    print(json.dumps({"symbol": args.symbol.upper(), "field": args.field, "interval": interval,
+                      **jsonable(buckets)}, indent=2))
+
+
+def command_info(history, args):
+    for symbol in history.symbols():
+        series = history.series(symbol)
+        rows = len(series)
+        last = series.last_time()
+        last_text = datetime.fromtimestamp(last, timezone.utc).isoformat() if last else '-'
+        print(f"{symbol}: {rows} ticks, {rows * ITEM_SIZE * len(COLUMNS)} bytes, last {last_text}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Columnar crypto price history')
+    parser.add_argument('--dir', default=DEFAULT_DIR, help='history directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    append = commands.add_parser('append', help='append the coins of a crypto-prices.json')
+    append.add_argument('path', nargs='?', default='data/crypto-prices.json')
+
+    stats = commands.add_parser('stats', help='rolling statistics for the latest ticks')
+    stats.add_argument('symbol')
+    stats.add_argument('--field', choices=FIELDS, default='price')
+    stats.add_argument('--window', type=int, default=7, help='window length in ticks')
+    stats.add_argument('--last', type=int, default=30, help='number of ticks to show')
+
+    chart = commands.add_parser('chart', help='OHLC buckets for charts')
+    chart.add_argument('symbol')
+    chart.add_argument('--field', choices=FIELDS, default='price')
+    chart.add_argument('--interval', help='bucket size: 15m, 6h, 1d, 1w or seconds')
+    chart.add_argument('--points', type=int, default=200, help='bucket count when no --interval')
+    chart.add_argument('--since', help='ISO date of the first tick to include')
+
+    commands.add_parser('info', help='symbols, tick counts and sizes')
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'window', 1) < 1:
+        parser.error("--window must be at least 1")
+    history = PriceHistory(args.dir)
+
+    if args.command == 'append':
+        command_append(history, args)
+    elif args.command == 'stats':
+        command_stats(history, args)
+    elif args.command == 'chart':
+        command_chart(history, args)
+    else:
+        command_info(history, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
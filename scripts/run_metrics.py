@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing spans for a fetch run, written as a metrics record.
+
+start() begins recording for the process; span() then times a phase
+(browser launch, navigation, download, parse, ...) and yields a dict the
+phase can add bytes/items/status to. Spans from worker threads (hedged
+fetch strategies, enrichment) are tagged with the thread name. span() is a
+no-op when nothing was started, so instrumented code also runs standalone.
+
+RunMetrics.append() adds one JSON line per run to a sidecar file, so
+latency regressions show up by comparing runs:
+
+  {"run": "fetch_rhizome", "started_at": "...", "seconds": 4.21, "status": "success",
+   "phases": {"navigation": {"seconds": 2.9, "count": 1}, "parse": {...}},
+   "spans": [{"name": "navigation", "start": 0.81, "seconds": 2.9}, ...]}
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Numeric span fields summed per phase
+TOTALLED_FIELDS = ('bytes', 'items')
+
+
+class RunMetrics:
+    """Spans and run-level fields for one run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.fields = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **fields):
+        record = dict(fields)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record = {"name": name, "start": round(started - self.t0, 4),
+                      "seconds": round(time.perf_counter() - started, 4), **record}
+            thread = threading.current_thread()
+            if thread is not threading.main_thread():
+                record['thread'] = thread.name
+            with self.lock:
+                self.spans.append(record)
+
+    def annotate(self, **fields):
+        self.fields.update(fields)
+
+    def phases(self):
+        """Per phase name: total seconds, span count and summed bytes/items."""
+        totals = {}
+        for record in self.spans:
+            phase = totals.setdefault(record['name'], {"seconds": 0.0, "count": 0})
+            phase['seconds'] = round(phase['seconds'] + record['seconds'], 4)
+            phase['count'] += 1
+            for field in TOTALLED_FIELDS:
+                if isinstance(record.get(field), int):
+                    phase[field] = phase.get(field, 0) + record[field]
+        return totals
+
+    def to_dict(self):
+        return {
+            "run": self.name,
+            "started_at": self.started_at,
+            "seconds": round(time.perf_counter() - self.t0, 4),
+            **self.fields,
+            "phases": self.phases(),
+            "spans": sorted(self.spans, key=lambda record: record['start']),
+        }
+
+    def append(self, path):
+        """Append this run's record as one line to path and print a summary."""
+        record = self.to_dict()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+        summary = ', '.join(f"{name} {phase['seconds']:.2f}s" for name, phase in record['phases'].items())
+        print(f"Run took {record['seconds']:.2f}s ({summary}); metrics appended to {path}", file=sys.stderr)
+        return record
+
+
+_current = None
+
+
+def start(name):
+    """Start recording spans for this process and return the RunMetrics."""
+    global _current
+    _current = RunMetrics(name)
+    return _current
+
+
+@contextmanager
+def span(name, **fields):
+    """Time a phase of the current run; yields a dict for extra fields."""
+    if _current is None:
+        yield dict(fields)
+        return
+    with _current.span(name, **fields) as record:
+        yield record
+
+
+def annotate(**fields):
+    """Add run-level fields (status, outcome, ...) to the current run."""
+    if _current is not None:
+        _current.annotate(**fields)
@@ -5,29 +5,42 @@ This script attempts to fetch the Rhizome community page with various techniques
 """
 
 import json
+import os
 import sys
 from datetime import datetime
-import time
+
+from cloudflare import CHALLENGED, CircuitBreaker, is_challenge_page, is_challenge_response, read_head
+from extraction_rules import extract_from_soup, load_rules
+from http_cache import NOT_MODIFIED, ValidatorCache
+from http_client import FetchError, default_client
+
+COMMUNITY_URL = os.environ.get('RHIZOME_URL', 'https://rhizome.org/community/')
+RHIZOME_RULES = load_rules('rhizome_rules')
 
 try:
-    import requests
     from bs4 import BeautifulSoup
 except ImportError:
-    print("Error: Required packages not installed. Run: pip install requests beautifulsoup4", file=sys.stderr)
+    print("Error: Required packages not installed. Run: pip install beautifulsoup4", file=sys.stderr)
     sys.exit(1)
 
 
-def fetch_with_session():
-    """Try to fetch the page using a session with browser-like headers."""
-    session = requests.Session()
+def fetch_with_session(url=COMMUNITY_URL, cache=None):
+    """Try to fetch the page over the shared pooled client with browser-like headers.
+
+    With a ValidatorCache the request is conditional; NOT_MODIFIED is
+    returned when the server answers 304. CHALLENGED is returned as soon as
+    the headers or first few KB show a Cloudflare challenge, or when
+    recent runs were challenged so often that the circuit breaker is open.
+    """
+    breaker = CircuitBreaker('scrape_rhizome.session')
+    if not breaker.allow():
+        return CHALLENGED
 
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
         'DNT': '1',
-        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
         'Sec-Fetch-Dest': 'document',
         'Sec-Fetch-Mode': 'navigate',
@@ -35,22 +48,35 @@ def fetch_with_session():
         'Cache-Control': 'max-age=0',
     }
 
-    url = 'https://rhizome.org/community/'
+    if cache:
+        headers.update(cache.conditional_headers(url))
 
     try:
-        # First request might get challenge
-        response = session.get(url, headers=headers, timeout=30)
-
-        # If we get a challenge, wait and retry
-        if 'Just a moment' in response.text or response.status_code == 403:
-            print(f"Cloudflare challenge detected (status {response.status_code})", file=sys.stderr)
-            time.sleep(5)
-            response = session.get(url, headers=headers, timeout=30)
-
-        response.raise_for_status()
-        return response.text
-
-    except requests.RequestException as e:
+        with default_client().get(url, headers=headers) as response:
+            if response.status == 304 and cache:
+                return NOT_MODIFIED
+
+            # A JavaScript challenge won't clear by waiting and retrying without a browser
+            head = b''
+            challenged = response.status == 403 or is_challenge_response(response.status, response.headers)
+            if not challenged:
+                head = read_head(response.read)
+                challenged = is_challenge_page(head.decode('utf-8', errors='replace'))
+            if challenged:
+                print(f"Cloudflare challenge detected (status {response.status}), aborting transfer", file=sys.stderr)
+                breaker.record_challenge()
+                return CHALLENGED
+            breaker.record_success()
+
+            if response.status >= 400:
+                print(f"Error fetching page: HTTP {response.status} {response.reason}", file=sys.stderr)
+                return None
+            html_content = (head + response.read()).decode(response.charset or 'utf-8', errors='replace')
+        if cache:
+            cache.store(url, response.headers, html_content)
+        return html_content
+
+    except FetchError as e:
         print(f"Error fetching page: {e}", file=sys.stderr)
         return None
 
@@ -58,71 +84,24 @@ def fetch_with_session():
 def parse_community_listings(html_content):
     """Parse the HTML content to extract community listings."""
     soup = BeautifulSoup(html_content, 'html.parser')
-
-    listings = []
-
-    # Try various selectors that might contain community listings
-    # These are common patterns for listing pages
-
-    # Look for article elements, list items, or divs with specific classes
-    potential_containers = []
-
-    # Try common listing patterns
-    potential_containers.extend(soup.find_all('article'))
-    potential_containers.extend(soup.find_all('div', class_=lambda x: x and ('listing' in x.lower() or 'item' in x.lower() or 'post' in x.lower())))
-    potential_containers.extend(soup.find_all('li', class_=lambda x: x and ('listing' in x.lower() or 'item' in x.lower())))
-
-    # If we find specific listing elements
-    for item in potential_containers[:15]:  # Limit to 15 items
-        listing = {}
-
-        # Try to find title
-        title_elem = item.find(['h1', 'h2', 'h3', 'h4', 'a'])
-        if title_elem:
-            listing['title'] = title_elem.get_text(strip=True)
-
-        # Try to find link
-        link_elem = item.find('a', href=True)
-        if link_elem:
-            href = link_elem['href']
-            if href.startswith('/'):
-                href = f"https://rhizome.org{href}"
-            listing['url'] = href
-
-        # Try to find description
-        desc_elem = item.find(['p', 'div', 'span'], class_=lambda x: x and ('desc' in x.lower() or 'summary' in x.lower() or 'excerpt' in x.lower()))
-        if desc_elem:
-            listing['description'] = desc_elem.get_text(strip=True)[:200]
-
-        # Try to find date
-        date_elem = item.find(['time', 'span'], class_=lambda x: x and 'date' in x.lower())
-        if date_elem:
-            listing['date'] = date_elem.get_text(strip=True)
-            if date_elem.has_attr('datetime'):
-                listing['date'] = date_elem['datetime']
-
-        # Only add if we have at least a title
-        if listing.get('title'):
-            # Fill in missing fields with defaults
-            if 'url' not in listing:
-                listing['url'] = 'https://rhizome.org/community/'
-            if 'description' not in listing:
-                listing['description'] = ''
-            if 'type' not in listing:
-                listing['type'] = 'community-listing'
-            if 'date' not in listing:
-                listing['date'] = datetime.now().isoformat()
-
-            listings.append(listing)
-
-    return listings
+    return extract_from_soup(soup, RHIZOME_RULES)
 
 
 def main():
     """Main function to scrape Rhizome community page."""
     print("Fetching Rhizome community page...", file=sys.stderr)
 
-    html_content = fetch_with_session()
+    cache = ValidatorCache('scrape_rhizome')
+    html_content = fetch_with_session(cache=cache)
+
+    if html_content is NOT_MODIFIED:
+        # Re-emit the cached output unchanged so the data file stays identical
+        cached = cache.cached_result(COMMUNITY_URL)
+        if cached is not None:
+            print("Page not modified since last fetch (304)", file=sys.stderr)
+            print(json.dumps(cached, indent=2))
+            return
+        html_content = cache.cached_body(COMMUNITY_URL)
 
     if not html_content:
         # Create error response
@@ -144,7 +123,7 @@ def main():
         sys.exit(1)
 
     # Check if we got the real page or Cloudflare challenge
-    if 'Just a moment' in html_content or 'Enable JavaScript and cookies to continue' in html_content:
+    if html_content is CHALLENGED or is_challenge_page(html_content):
         result = {
             "community_listings": [
                 {
@@ -187,6 +166,9 @@ def main():
         "status": "success" if listings else "no-listings-found"
     }
 
+    if listings:
+        cache.store_result(COMMUNITY_URL, result)
+
     print(json.dumps(result, indent=2))
     print(f"Found {len(listings)} community listings", file=sys.stderr)
 
@@ -3,120 +3,174 @@
 Simple Rhizome.org community scraper using only standard library.
 """
 
+import argparse
+import codecs
 import json
+import os
 import sys
-import urllib.request
-import urllib.error
 from datetime import datetime
-import re
-from html.parser import HTMLParser
-
-
-class RhizomeParser(HTMLParser):
-    """Simple HTML parser to extract listing information."""
-
-    def __init__(self):
-        super().__init__()
-        self.listings = []
-        self.current_listing = {}
-        self.in_title = False
-        self.in_description = False
-        self.in_link = False
-        self.current_tag_stack = []
-
-    def handle_starttag(self, tag, attrs):
-        self.current_tag_stack.append(tag)
-        attrs_dict = dict(attrs)
-
-        # Look for links
-        if tag == 'a' and 'href' in attrs_dict:
-            href = attrs_dict['href']
-            if href and not href.startswith('#') and not href.startswith('javascript:'):
-                self.current_listing['url'] = href if href.startswith('http') else f'https://rhizome.org{href}'
-                self.in_link = True
-
-        # Look for headings (potential titles)
-        if tag in ['h1', 'h2', 'h3', 'h4']:
-            self.in_title = True
-
-        # Look for article or list item containers
-        if tag in ['article', 'li']:
-            if self.current_listing and self.current_listing.get('title'):
-                self.listings.append(self.current_listing)
-            self.current_listing = {}
-
-    def handle_endtag(self, tag):
-        if self.current_tag_stack and self.current_tag_stack[-1] == tag:
-            self.current_tag_stack.pop()
-
-        if tag == 'a':
-            self.in_link = False
-        if tag in ['h1', 'h2', 'h3', 'h4']:
-            self.in_title = False
-
-    def handle_data(self, data):
-        data = data.strip()
-        if not data:
-            return
 
-        if self.in_title and self.in_link:
-            self.current_listing['title'] = data
-        elif self.in_link and not self.current_listing.get('title'):
-            # Sometimes the link text is the title
-            self.current_listing['title'] = data
-
-    def get_listings(self):
-        # Add the last listing if exists
-        if self.current_listing and self.current_listing.get('title'):
-            self.listings.append(self.current_listing)
-
-        # Fill in missing fields
-        for listing in self.listings:
-            if 'description' not in listing:
-                listing['description'] = ''
-            if 'type' not in listing:
-                listing['type'] = 'community-listing'
-            if 'date' not in listing:
-                listing['date'] = datetime.now().isoformat()
-            if 'url' not in listing:
-                listing['url'] = 'https://rhizome.org/community/'
-
-        return self.listings[:15]  # Limit to 15 items
-
-
-def fetch_page():
-    """Fetch the Rhizome community page."""
-    url = 'https://rhizome.org/community/'
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9',
-    }
+from cloudflare import (CHALLENGED, HEAD_BYTES, CircuitBreaker, is_challenge_page,
+                        is_challenge_response, read_head)
+from extraction_rules import RuleScanner, load_rules
+from http_cache import NOT_MODIFIED, ValidatorCache
+from http_client import FetchError, default_client
+
+COMMUNITY_URL = os.environ.get('RHIZOME_URL', 'https://rhizome.org/community/')
+RHIZOME_RULES = load_rules('rhizome_rules')
+BREAKER_NAME = 'scrape_rhizome_simple.urllib'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+class RhizomeParser(RuleScanner):
+    """Simple HTML parser to extract listing information.
+
+    A RuleScanner over rhizome_rules.json: it stops collecting once limit
+    listings are complete (see done) and keeps its tag stack bounded
+    however unbalanced the HTML is.
+    """
 
-    req = urllib.request.Request(url, headers=headers)
+    def __init__(self, limit=15, max_depth=256):
+        super().__init__(RHIZOME_RULES, limit=limit, max_depth=max_depth)
+
+
+def fetch_page(url=COMMUNITY_URL, cache=None):
+    """Fetch the Rhizome community page.
+
+    With a ValidatorCache the request is conditional; NOT_MODIFIED is
+    returned when the server answers 304. CHALLENGED is returned as soon as
+    the headers or first few KB show a Cloudflare challenge, or while the
+    circuit breaker is open.
+    """
+    breaker = CircuitBreaker(BREAKER_NAME)
+    if not breaker.allow():
+        return CHALLENGED
+
+    headers = dict(HEADERS)
+    if cache:
+        headers.update(cache.conditional_headers(url))
 
     try:
-        with urllib.request.urlopen(req, timeout=30) as response:
-            content = response.read().decode('utf-8')
+        with default_client().get(url, headers=headers) as response:
+            if response.status == 304 and cache:
+                return NOT_MODIFIED
+            if is_challenge_response(response.status, response.headers):
+                print(f"Cloudflare challenge detected (HTTP {response.status})", file=sys.stderr)
+                breaker.record_challenge()
+                return CHALLENGED
+            if response.status != 200:
+                print(f"HTTP Error {response.status}: {response.reason}", file=sys.stderr)
+                return None
+
+            head = read_head(response.read)
+            if is_challenge_page(head.decode('utf-8', errors='replace')):
+                print("Cloudflare challenge detected, aborting transfer", file=sys.stderr)
+                breaker.record_challenge()
+                return CHALLENGED
+            breaker.record_success()
+
+            content = (head + response.read()).decode(response.charset or 'utf-8', errors='replace')
+            if cache:
+                cache.store(url, response.headers, content)
             return content
-    except urllib.error.HTTPError as e:
-        print(f"HTTP Error {e.code}: {e.reason}", file=sys.stderr)
+    except FetchError as e:
+        print(f"Fetch Error: {e}", file=sys.stderr)
         return None
-    except urllib.error.URLError as e:
-        print(f"URL Error: {e.reason}", file=sys.stderr)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return None
+
+
+def fetch_listings_streaming(url=COMMUNITY_URL, limit=15, chunk_size=16 * 1024):
+    """Feed the page into a RhizomeParser chunk by chunk as it arrives.
+
+    The connection is closed as soon as the parser has limit listings, so
+    neither the download nor parser memory grows with the page size.
+    Returns (parser, head, bytes_read), where head is the first few KB of
+    decoded text, CHALLENGED if the first chunk is a Cloudflare challenge
+    (or the circuit breaker is open), or None on error.
+    """
+    breaker = CircuitBreaker(BREAKER_NAME)
+    if not breaker.allow():
+        return CHALLENGED
+
+    parser = RhizomeParser(limit=limit)
+    head = ''
+    bytes_read = 0
+
+    try:
+        with default_client().get(url, headers=HEADERS) as response:
+            if is_challenge_response(response.status, response.headers):
+                print(f"Cloudflare challenge detected (HTTP {response.status})", file=sys.stderr)
+                breaker.record_challenge()
+                return CHALLENGED
+            if response.status != 200:
+                print(f"HTTP Error {response.status}: {response.reason}", file=sys.stderr)
+                return None
+
+            decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+
+            while not parser.done:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    parser.feed(decoder.decode(b'', final=True))
+                    parser.close()
+                    break
+                bytes_read += len(chunk)
+                text = decoder.decode(chunk)
+                if not head:
+                    head = text[:HEAD_BYTES]
+                    if is_challenge_page(head):
+                        print("Cloudflare challenge detected, aborting transfer", file=sys.stderr)
+                        breaker.record_challenge()
+                        return CHALLENGED
+                    breaker.record_success()
+                parser.feed(text)
+
+        return parser, head, bytes_read
+    except FetchError as e:
+        print(f"Fetch Error: {e}", file=sys.stderr)
         return None
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         return None
 
 
-def main():
-    import sys
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Scrape Rhizome community listings to stdout as JSON')
+    arg_parser.add_argument('--stream', action='store_true',
+                            help='parse while downloading and stop once enough listings are found '
+                                 '(bypasses the validator cache)')
+    args = arg_parser.parse_args(argv)
 
     print("Fetching Rhizome community page...", file=sys.stderr)
 
-    html_content = fetch_page()
+    cache = ValidatorCache('scrape_rhizome_simple')
+    parser = None
+
+    if args.stream:
+        fetched = fetch_listings_streaming()
+        html_content = None
+        if fetched is CHALLENGED:
+            html_content = CHALLENGED
+        elif fetched:
+            parser, html_content, bytes_read = fetched
+    else:
+        html_content = fetch_page(cache=cache)
+
+    if html_content is NOT_MODIFIED:
+        # Re-emit the cached output unchanged so the data file stays identical
+        cached = cache.cached_result(COMMUNITY_URL)
+        if cached is not None:
+            print("Page not modified since last fetch (304)", file=sys.stderr)
+            print(json.dumps(cached, indent=2))
+            return
+        html_content = cache.cached_body(COMMUNITY_URL)
 
     if not html_content:
         result = {
@@ -137,7 +191,7 @@ def main():
         sys.exit(1)
 
     # Check for Cloudflare challenge
-    if 'Just a moment' in html_content or 'Enable JavaScript and cookies' in html_content:
+    if html_content is CHALLENGED or is_challenge_page(html_content):
         result = {
             "community_listings": [
                 {
@@ -155,17 +209,25 @@ def main():
         print(json.dumps(result, indent=2))
         sys.exit(1)
 
-    print(f"Successfully fetched {len(html_content)} bytes", file=sys.stderr)
-    print("Parsing community listings...", file=sys.stderr)
-
-    # Parse the HTML
-    parser = RhizomeParser()
-    try:
-        parser.feed(html_content)
+    if parser:
+        # Already parsed while streaming
+        print(f"Successfully fetched {bytes_read} bytes (streamed)", file=sys.stderr)
         listings = parser.get_listings()
-    except Exception as e:
-        print(f"Parse error: {e}", file=sys.stderr)
-        listings = []
+    else:
+        print(f"Successfully fetched {len(html_content)} bytes", file=sys.stderr)
+        print("Parsing community listings...", file=sys.stderr)
+
+        # Parse the HTML
+        parser = RhizomeParser()
+        try:
+            parser.feed(html_content)
+            if not parser.done:
+                # Flush a listing whose container is still open at the end of the page
+                parser.close()
+            listings = parser.get_listings()
+        except Exception as e:
+            print(f"Parse error: {e}", file=sys.stderr)
+            listings = []
 
     if not listings:
         print("Warning: No listings found", file=sys.stderr)
@@ -184,6 +246,9 @@ def main():
         "status": "success" if listings else "no-listings-found"
     }
 
+    if listings and not args.stream:
+        cache.store_result(COMMUNITY_URL, result)
+
     print(json.dumps(result, indent=2))
     print(f"Found {len(listings)} community listings", file=sys.stderr)
 
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Incremental, sharded inverted index over listings and headlines for the website.
+
+Every Rhizome listing and NYT headline that has ever appeared in
+data/rhizome.json or data/nytimes.json gets a document id, and the titles
+and descriptions are indexed in data/search/, which build-website.js copies
+next to the page:
+
+  manifest.json     counts, tombstones, stopwords and a hash per shard
+  terms/<ab>.json   {term: [id delta, weight, id delta, weight, ...]} for
+                    every term starting with <ab>
+  docs/<n>.json     [[title, url, kind, date, description], ...] for ids
+                    n * 256 to n * 256 + 255
+  keys.json         item key -> [id, content hash] (only used here)
+
+The browser loads the manifest, one term shard per query word (prefix
+matches come from the same shard) and the doc shards of the top results,
+so a search costs a few small requests however many years are indexed.
+
+Updates are append-only: a new item gets the next id, so its postings go
+at the end of each term's list, and only the shards it touches are
+rewritten. An item whose title, description or url changed is tombstoned
+and re-added under a new id. --rebuild drops tombstoned documents and
+renumbers the rest.
+
+Usage:
+  python3 scripts/search_index.py                      # index the current data files
+  python3 scripts/search_index.py --history            # also every listing in data/history/
+  python3 scripts/search_index.py --rebuild
+  python3 scripts/search_index.py --query "media art"  # try a query locally
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import unicodedata
+from collections import Counter
+from datetime import datetime, timezone
+
+from http_cache import write_atomic
+from merge_listings import listing_id
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+INDEX_DIR = os.path.join(ROOT_DIR, 'data', 'search')
+DATA_FILES = (os.path.join(ROOT_DIR, 'data', 'rhizome.json'), os.path.join(ROOT_DIR, 'data', 'nytimes.json'))
+DOCS_PER_SHARD = 256
+PREFIX_LENGTH = 2
+TITLE_WEIGHT = 3
+STOPWORDS = sorted(
+    'a an and are as at be but by for from has have he her his i in into is it its new of on or our she '
+    'that the their this to was we were what who will with you'.split()
+)
+STOPWORD_SET = frozenset(STOPWORDS)
+PLACEHOLDER_TYPES = ('system-message', 'placeholder')
+TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase ASCII word tokens without accents, stopwords or single characters.
+
+    The page's search script (build-website.js) tokenizes queries the same way.
+    """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    # Every combining mark (category M), as \p{M} does in the page's script
+    folded = ''.join(c for c in decomposed if not unicodedata.category(c).startswith('M')).lower()
+    return [token for token in TOKEN.findall(folded) if len(token) > 1 and token not in STOPWORD_SET]
+
+
+def content_hash(item):
+    content = json.dumps([item['title'], item['description'], item['url']], separators=(',', ':'))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:10]
+
+
+def items_from_data(data):
+    """Searchable items from a rhizome.json or nytimes.json document."""
+    items = []
+    for listing in data.get('community_listings', []):
+        # The scrapers' "access limited" / "parsing failed" stand-ins aren't listings
+        if listing.get('type') not in PLACEHOLDER_TYPES:
+            items.append({
+                "key": f"listing:{listing.get('id') or listing_id(listing)}",
+                "kind": "listing",
+                "title": listing.get('title') or '',
+                "description": listing.get('description') or '',
+                "url": listing.get('url') or '',
+                "date": listing.get('date') or listing.get('first_seen') or data.get('last_updated') or '',
+            })
+    for headline in data.get('headlines', []):
+        items.append({
+            "key": f"headline:{headline.get('url') or headline.get('title')}",
+            "kind": "headline",
+            "title": headline.get('title') or '',
+            "description": headline.get('description') or '',
+            "url": headline.get('url') or '',
+            "date": data.get('last_updated') or '',
+        })
+    return [item for item in items if item['title']]
+
+
+def items_from_history(directory=None):
+    """The latest version of every listing in a ListingHistory, dated by first sighting."""
+    from listing_history import ListingHistory
+
+    history = ListingHistory(directory)
+    listings = []
+    for key in history.index['ids']:
+        versions = history.versions(key)
+        if versions:
+            listing = dict(versions[-1][1], id=key)
+            listing['date'] = listing.get('date') or versions[0][0]
+            listings.append(listing)
+    return items_from_data({"community_listings": listings})
+
+
+def shard_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]
+
+
+class SearchIndex:
+    """The on-disk index, loading and rewriting only the shards an update touches."""
+
+    def __init__(self, directory=INDEX_DIR):
+        self.directory = directory
+        try:
+            with open(os.path.join(directory, 'manifest.json')) as f:
+                self.manifest = json.load(f)
+            with open(os.path.join(directory, 'keys.json')) as f:
+                self.keys = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {"doc_count": 0, "deleted": [], "doc_shards": {}, "term_shards": {}}
+            self.keys = {}
+        self.deleted = set(self.manifest['deleted'])
+        self.term_shards = {}
+        self.doc_shards = {}
+        self.last_ids = {}
+        self.dirty_terms = set()
+        self.dirty_docs = set()
+
+    def _load(self, kind, name, default):
+        try:
+            with open(os.path.join(self.directory, kind, f"{name}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def term_shard(self, prefix):
+        if prefix not in self.term_shards:
+            self.term_shards[prefix] = self._load('terms', prefix, {})
+        return self.term_shards[prefix]
+
+    def doc_shard(self, number):
+        if number not in self.doc_shards:
+            self.doc_shards[number] = self._load('docs', number, [])
+        return self.doc_shards[number]
+
+    def _last_id(self, term, postings):
+        if term not in self.last_ids:
+            # Ids are delta-coded from 0, so the sum of deltas is the last id
+            self.last_ids[term] = sum(postings[0::2])
+        return self.last_ids[term]
+
+    def add(self, item):
+        """Index one item; returns 'added', 'updated' or None when it's already indexed as is."""
+        digest = content_hash(item)
+        existing = self.keys.get(item['key'])
+        if existing and existing[1] == digest:
+            return None
+        if existing:
+            self.deleted.add(existing[0])
+
+        doc_id = self.manifest['doc_count']
+        self.manifest['doc_count'] += 1
+        self.keys[item['key']] = [doc_id, digest]
+        number = doc_id // DOCS_PER_SHARD
+        self.doc_shard(number).append([item['title'], item['url'], item['kind'], item['date'], item['description']])
+        self.dirty_docs.add(number)
+
+        weights = Counter()
+        for token in tokenize(item['title']):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(item['description']):
+            weights[token] += 1
+        for term, weight in weights.items():
+            prefix = term[:PREFIX_LENGTH]
+            postings = self.term_shard(prefix).setdefault(term, [])
+            postings.extend([doc_id - self._last_id(term, postings), weight])
+            self.last_ids[term] = doc_id
+            self.dirty_terms.add(prefix)
+        return 'updated' if existing else 'added'
+
+    def save(self):
+        """Write the touched shards, then the keys and the manifest that points at them."""
+        for prefix in sorted(self.dirty_terms):
+            text = json.dumps(self.term_shards[prefix], separators=(',', ':'), sort_keys=True)
+            write_atomic(os.path.join(self.directory, 'terms', f"{prefix}.json"), text)
+            self.manifest['term_shards'][prefix] = shard_hash(text)
+        for number in sorted(self.dirty_docs):
+            text = json.dumps(self.doc_shards[number], separators=(',', ':'), ensure_ascii=False)
+            write_atomic(os.path.join(self.directory, 'docs', f"{number}.json"), text)
+            self.manifest['doc_shards'][str(number)] = shard_hash(text)
+        changed = bool(self.dirty_terms or self.dirty_docs)
+        self.dirty_terms.clear()
+        self.dirty_docs.clear()
+        if not changed and os.path.exists(os.path.join(self.directory, 'manifest.json')):
+            return False
+
+        write_atomic(os.path.join(self.directory, 'keys.json'),
+                     json.dumps(self.keys, separators=(',', ':'), sort_keys=True))
+        self.manifest.update({
+            "version": 1,
+            "docs_per_shard": DOCS_PER_SHARD,
+            "prefix_length": PREFIX_LENGTH,
+            "stopwords": STOPWORDS,
+            "live": self.manifest['doc_count'] - len(self.deleted),
+            "deleted": sorted(self.deleted),
+            "term_shards": dict(sorted(self.manifest['term_shards'].items())),
+            "doc_shards": dict(sorted(self.manifest['doc_shards'].items(), key=lambda kv: int(kv[0]))),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+        write_atomic(os.path.join(self.directory, 'manifest.json'), json.dumps(self.manifest, indent=1))
+        return True
+
+    def documents(self):
+        """Every live document as (id, row)."""
+        for number in sorted(int(n) for n in self.manifest['doc_shards']):
+            for offset, row in enumerate(self.doc_shard(number)):
+                doc_id = number * DOCS_PER_SHARD + offset
+                if doc_id not in self.deleted:
+                    yield doc_id, row
+
+    def search(self, query, limit=10):
+        """Rank documents the way the page's script does (for trying queries locally)."""
+        live = max(1, self.manifest['doc_count'] - len(self.deleted))
+        scores = None
+        for token in dict.fromkeys(tokenize(query)):
+            matched = Counter()
+            for term, postings in self.term_shard(token[:PREFIX_LENGTH]).items():
+                if not term.startswith(token):
+                    continue
+                idf = math.log(1 + live / (len(postings) // 2))
+                boost = 1.0 if term == token else 0.5
+                doc_id = 0
+                for delta, weight in zip(postings[0::2], postings[1::2]):
+                    doc_id += delta
+                    matched[doc_id] = max(matched[doc_id], weight * idf * boost)
+            scores = matched if scores is None else Counter({d: s + matched[d] for d, s in scores.items()
+                                                              if d in matched})
+        ranked = sorted(((score, doc_id) for doc_id, score in (scores or {}).items() if doc_id not in self.deleted),
+                        reverse=True)[:limit]
+        return [(doc_id, round(score, 3), self.doc_shard(doc_id // DOCS_PER_SHARD)[doc_id % DOCS_PER_SHARD])
+                for score, doc_id in ranked]
+
+
+def rebuild(directory=INDEX_DIR):
+    """Re-index the live documents under consecutive ids, dropping tombstones; returns their count."""
+    old = SearchIndex(directory)
+    key_of = {doc_id: key for key, (doc_id, _) in old.keys.items()}
+    items = [{"key": key_of[doc_id], "title": row[0], "url": row[1], "kind": row[2], "date": row[3],
+              "description": row[4]} for doc_id, row in old.documents() if doc_id in key_of]
+
+    for name in ('terms', 'docs'):
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    for name in ('manifest.json', 'keys.json'):
+        if os.path.exists(os.path.join(directory, name)):
+            os.unlink(os.path.join(directory, name))
+    index = SearchIndex(directory)
+    for item in items:
+        index.add(item)
+    index.save()
+    return len(items)
+
+
+def update(paths=DATA_FILES, directory=INDEX_DIR, history=False):
+    """Add new and changed items from the data files.
+
+    history is False, or a listing history directory (None for data/history)
+    whose listings are indexed too.
+    """
+    index = SearchIndex(directory)
+    counts = Counter()
+    items = items_from_history(history) if history is not False else []
+    for path in paths:
+        try:
+            with open(path) as f:
+                items.extend(items_from_data(json.load(f)))
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+    for item in items:
+        outcome = index.add(item)
+        if outcome:
+            counts[outcome] += 1
+    index.save()
+    return index, counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Update the website search index in data/search/')
+    parser.add_argument('paths', nargs='*', default=list(DATA_FILES), help='rhizome.json / nytimes.json files')
+    parser.add_argument('--dir', default=INDEX_DIR, help='index directory')
+    parser.add_argument('--history', nargs='?', const='', metavar='DIR',
+                        help='also index every listing in a listing history (default data/history)')
+    parser.add_argument('--rebuild', action='store_true', help='compact away replaced documents')
+    parser.add_argument('--query', help='search the index instead of updating it')
+    args = parser.parse_args(argv)
+
+    if args.query:
+        for doc_id, score, (title, url, kind, date, _) in SearchIndex(args.dir).search(args.query):
+            print(f"{score:>7}  {kind:<8}  {date[:10]:<10}  {title}  {url}")
+        return 0
+    if args.rebuild:
+        count = rebuild(args.dir)
+        print(f"✓ Rebuilt {args.dir} with {count} document(s)", file=sys.stderr)
+        return 0
+
+    index, counts = update(args.paths, args.dir, history=False if args.history is None else args.history or None)
+    print(f"✓ {counts['added']} added, {counts['updated']} updated; "
+          f"{index.manifest['doc_count'] - len(index.deleted)} document(s) in {args.dir}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
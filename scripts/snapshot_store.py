@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store of fetched pages, with memoized parses.
+
+Every fetched body is stored gzipped under its SHA-256 in
+objects/<ab>/<hash>.html.gz, so identical pages are kept once however often
+they are fetched. snapshots.jsonl logs each fetch (time, hash, URL, source).
+memo/<parser version>/<hash>.json caches the listings a parser version got
+from a page. An unchanged page is never parsed twice, and a parser fix (a
+new CompiledRules.version) can be replayed over every stored page without
+re-fetching. Pages whose parse failed are kept too, so they can be debugged.
+
+The memo records which fields the parser stamped with the parse time ($now
+defaults), and those are re-stamped on a memo hit, just as a fresh parse
+would.
+
+Usage:
+  python3 scripts/snapshot_store.py list
+  python3 scripts/snapshot_store.py show <hash>
+  python3 scripts/snapshot_store.py replay [--rules rhizome_rules]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from extraction_rules import ParseTime, extract_listings, load_rules
+from http_cache import DEFAULT_CACHE_DIR, write_atomic
+from merge_listings import is_placeholder_date
+
+DEFAULT_SNAPSHOT_DIR = os.environ.get('RHIZOME_SNAPSHOT_DIR', os.path.join(DEFAULT_CACHE_DIR, 'snapshots'))
+
+
+def content_hash(body):
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+class SnapshotStore:
+    """Page bodies by content hash plus a (hash, parser version) -> listings memo."""
+
+    def __init__(self, directory=None):
+        self.directory = os.path.normpath(directory or DEFAULT_SNAPSHOT_DIR)
+        self.log_path = os.path.join(self.directory, 'snapshots.jsonl')
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], f"{digest}.html.gz")
+
+    def _memo_path(self, digest, version):
+        return os.path.join(self.directory, 'memo', version, f"{digest}.json")
+
+    def put(self, body, url='', source=''):
+        """Store body (once per distinct content), log the fetch and return its hash."""
+        digest = content_hash(body)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            write_atomic(path, gzip.compress(body.encode('utf-8')), mode='wb')
+
+        entry = {"t": datetime.now(timezone.utc).isoformat(), "hash": digest,
+                 "url": url, "source": source, "bytes": len(body)}
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        return digest
+
+    def get(self, digest):
+        """The stored body for a hash, or None."""
+        try:
+            with gzip.open(self._object_path(digest), 'rb') as f:
+                return f.read().decode('utf-8')
+        except OSError:
+            return None
+
+    def memo_get(self, digest, version):
+        """Memoized listings for (hash, parser version), or None if never parsed."""
+        try:
+            with open(self._memo_path(digest, version)) as f:
+                memo = json.load(f)
+            listings, stamped = memo['listings'], memo['stamped']
+        except (OSError, ValueError, KeyError):
+            return None
+
+        now = ParseTime(datetime.now(timezone.utc).isoformat())
+        return [dict(listing, **{field: now for field in fields}) for listing, fields in zip(listings, stamped)]
+
+    def memo_put(self, digest, version, listings, parsed_at):
+        stamped = [[field for field, value in listing.items() if is_placeholder_date(value)] for listing in listings]
+        memo = {"parsed_at": parsed_at.isoformat(), "listings": listings, "stamped": stamped}
+        write_atomic(self._memo_path(digest, version), json.dumps(memo, separators=(',', ':')))
+
+    def parse(self, body, rules, parse=None, url='', source=''):
+        """Store body and return (hash, listings), parsing only on a memo miss.
+
+        parse defaults to the stdlib extract_listings(body, rules); the memo
+        key is rules.version, so pass the parse function that goes with it.
+        """
+        digest = self.put(body, url=url, source=source)
+        listings = self.memo_get(digest, rules.version)
+        if listings is not None:
+            print(f"Snapshot {digest[:12]} already parsed, reusing {len(listings)} listing(s)", file=sys.stderr)
+            return digest, listings
+
+        parsed_at = datetime.now(timezone.utc)
+        listings = parse(body) if parse else extract_listings(body, rules)
+        self.memo_put(digest, rules.version, listings, parsed_at)
+        return digest, listings
+
+    def entries(self):
+        """Every logged fetch, oldest first."""
+        try:
+            with open(self.log_path) as f:
+                return [json.loads(line) for line in f if line.endswith('\n')]
+        except OSError:
+            return []
+
+    def replay(self, rules, parse=None):
+        """Re-parse each distinct stored page with rules; yields (first entry, listings)."""
+        seen = set()
+        for entry in self.entries():
+            if entry['hash'] in seen:
+                continue
+            seen.add(entry['hash'])
+            listings = self.memo_get(entry['hash'], rules.version)
+            if listings is None:
+                body = self.get(entry['hash'])
+                if body is None:
+                    continue
+                parsed_at = datetime.now(timezone.utc)
+                listings = parse(body) if parse else extract_listings(body, rules)
+                self.memo_put(entry['hash'], rules.version, listings, parsed_at)
+            yield entry, listings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect and re-parse stored page snapshots')
+    parser.add_argument('--dir', default=DEFAULT_SNAPSHOT_DIR, help='snapshot directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='every logged fetch')
+    show = commands.add_parser('show', help='print a stored page')
+    show.add_argument('hash', help='content hash (a unique prefix is enough)')
+    replay = commands.add_parser('replay', help='re-parse every stored page with the current rules')
+    replay.add_argument('--rules', default='rhizome_rules', help='rules file name in scripts/')
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.dir)
+    if args.command == 'list':
+        for entry in store.entries():
+            print(f"{entry['t']}  {entry['hash'][:12]}  {entry['bytes']:>9}  {entry['source']:<10}  {entry['url']}")
+        return 0
+
+    if args.command == 'show':
+        matches = {e['hash'] for e in store.entries() if e['hash'].startswith(args.hash)}
+        if len(matches) != 1:
+            print("No such snapshot" if not matches else "Ambiguous hash prefix", file=sys.stderr)
+            return 1
+        print(store.get(matches.pop()))
+        return 0
+
+    rules = load_rules(args.rules)
+    results = [{"hash": entry['hash'], "first_fetched": entry['t'], "url": entry['url'],
+                "parser_version": rules.version, "count": len(listings), "listings": listings}
+               for entry, listings in store.replay(rules)]
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())